@@ -0,0 +1,198 @@
+# ==============================================
+# SHARED PER-ACCOUNT RATE LIMITER + MUTEX
+# ==============================================
+#
+# Every entry point that talks to Instagram for an account (scheduler
+# workers, app.py "Post Now", post_*_all, send_dm, follow_user) goes
+# through account_slot(username, action):
+#   1. a cross-process mutex, so one account never has two live sessions
+#   2. a token bucket per (account, action), persisted in SQLite so all
+#      processes share it
+# Rates adapt AIMD-style: halve on throttling, creep back up on success.
+
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from account_registry import registry
+from file_lock import LockBusy, file_mutex
+from retry_policy import classify_error
+
+BASE_DIR = Path(__file__).parent
+LIMITS_DB = Path(os.getenv("ACCOUNT_LIMITS_DB", str(BASE_DIR / ".account_limits.db")))
+LOCKS_DIR = BASE_DIR / ".account_locks"
+LOCKS_DIR.mkdir(exist_ok=True)
+
+# Seconds between actions per account. "interval" is the starting point,
+# AIMD keeps it inside [min_interval, max_interval].
+# Override per account in accounts.json: {"username": ..., "spacing": {"reel": 90}}
+ACTION_LIMITS = {
+    "reel":   {"interval": 60, "min_interval": 30, "max_interval": 1800},
+    "story":  {"interval": 20, "min_interval": 10, "max_interval": 900},
+    "image":  {"interval": 30, "min_interval": 15, "max_interval": 1200},
+    "dm":     {"interval": 45, "min_interval": 20, "max_interval": 1800},
+    "follow": {"interval": 60, "min_interval": 30, "max_interval": 3600},
+}
+DEFAULT_LIMIT = {"interval": 60, "min_interval": 30, "max_interval": 1800}
+
+BURST = 1                  # max tokens a bucket can hold
+ADDITIVE_STEP = 0.02       # fraction of the max rate added back per success
+MULTIPLICATIVE_DECREASE = 0.5
+
+
+# ---------------------------------------
+# Cross-process mutex (file lock + in-process lock)
+# ---------------------------------------
+AccountBusy = LockBusy   # account_mutex(wait=False) on an account in use
+
+
+def account_mutex(username: str, wait: bool = True):
+    """Only one holder per account across threads and processes."""
+    return file_mutex(LOCKS_DIR / f"{username}.lock", wait)
+
+
+# ---------------------------------------
+# Token buckets (SQLite, shared by all processes)
+# ---------------------------------------
+class AccountLimiter:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS buckets (
+        username TEXT NOT NULL,
+        action   TEXT NOT NULL,
+        tokens   REAL NOT NULL,
+        rate     REAL NOT NULL,
+        updated  REAL NOT NULL,
+        PRIMARY KEY (username, action)
+    );
+    """
+
+    def __init__(self, db_path=LIMITS_DB):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self.conn.executescript(self.SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _limits(self, username: str, action: str) -> Dict[str, float]:
+        limits = dict(ACTION_LIMITS.get(action, DEFAULT_LIMIT))
+        interval = registry.spacing(username).get(action)
+        if interval:
+            limits["interval"] = interval
+            limits["min_interval"] = min(limits["min_interval"], interval)
+        return limits
+
+    def _update(self, username: str, action: str, fn):
+        """Run fn(tokens, rate, limits) → (tokens, rate, result) in one transaction."""
+        limits = self._limits(username, action)
+        now = time.time()
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, rate, updated FROM buckets WHERE username = ? AND action = ?",
+                (username, action),
+            ).fetchone()
+
+            if row is None:
+                tokens, rate = float(BURST), 1.0 / limits["interval"]
+            else:
+                tokens, rate, updated = row
+                tokens = min(BURST, tokens + (now - updated) * rate)
+
+            tokens, rate, result = fn(tokens, rate, limits)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (username, action, tokens, rate, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (username, action, tokens, rate, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return result
+
+    def try_acquire(self, username: str, action: str) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        def take(tokens, rate, limits):
+            if tokens >= 1:
+                return tokens - 1, rate, 0.0
+            return tokens, rate, (1 - tokens) / rate
+
+        return self._update(username, action, take)
+
+    def acquire(self, username: str, action: str):
+        while True:
+            wait = self.try_acquire(username, action)
+            if wait <= 0:
+                return
+            print(f"[account_limiter] ⏳ @{username} {action}: waiting {wait:.0f}s")
+            time.sleep(wait)
+
+    def record_success(self, username: str, action: str):
+        """Additive increase towards the fastest allowed rate."""
+        def inc(tokens, rate, limits):
+            max_rate = 1.0 / limits["min_interval"]
+            return tokens, min(max_rate, rate + ADDITIVE_STEP * max_rate), None
+
+        self._update(username, action, inc)
+
+    def record_throttle(self, username: str, action: str):
+        """Multiplicative decrease, and drain the bucket so the next action waits."""
+        def dec(tokens, rate, limits):
+            min_rate = 1.0 / limits["max_interval"]
+            return 0.0, max(min_rate, rate * MULTIPLICATIVE_DECREASE), None
+
+        self._update(username, action, dec)
+        print(f"[account_limiter] 🐢 @{username} {action}: throttled → slowing down")
+
+    def record_result(self, username: str, action: str, exc: Optional[BaseException] = None):
+        if exc is None:
+            self.record_success(username, action)
+        elif classify_error(exc) == "rate_limit":
+            self.record_throttle(username, action)
+
+
+_limiter: Optional[AccountLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> AccountLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AccountLimiter()
+        return _limiter
+
+
+@contextmanager
+def account_slot(username: str, action: str, report: bool = True):
+    """
+    Hold the account mutex and one rate-limit token for `action`.
+    With report=True the outcome of the block feeds the AIMD rate.
+    """
+    limiter = get_limiter()
+    with account_mutex(username):
+        limiter.acquire(username, action)
+        try:
+            yield limiter
+        except Exception as e:
+            if report:
+                limiter.record_result(username, action, e)
+            raise
+        else:
+            if report:
+                limiter.record_success(username, action)
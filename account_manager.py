@@ -2,18 +2,18 @@
 # FIXED ACCOUNT MANAGER (STABLE)
 # ================================
 
-import os
 import json
-import time
-import errno
 from pathlib import Path
 from instagrapi import Client
 from typing import Optional
 
-SESSIONS_DIR = Path("sessions")
+from account_registry import BASE_DIR, SESSIONS_DIR
+from file_lock import file_mutex
+from http_transport import attach
+
 SESSIONS_DIR.mkdir(exist_ok=True)
 
-LOCKS_DIR = Path(".login_locks")
+LOCKS_DIR = BASE_DIR / ".login_locks"
 LOCKS_DIR.mkdir(exist_ok=True)
 
 # FIXED: SINGLE STABLE DEVICE (very important for session reuse)
@@ -24,29 +24,12 @@ STABLE_DEVICE = {
     "android_release": "10"
 }
 
-def _lock_path(username: str) -> Path:
-    return LOCKS_DIR / f"{username}.lock"
-
-def _acquire_lock(username: str, timeout: int = 30) -> bool:
-    lock = _lock_path(username)
-    start = time.time()
-    while True:
-        try:
-            fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-            os.close(fd)
-            return True
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                raise
-            if time.time() - start > timeout:
-                return False
-            time.sleep(0.5)
-
-def _release_lock(username: str):
-    try:
-        _lock_path(username).unlink()
-    except FileNotFoundError:
-        pass
+def login_lock(username: str):
+    """
+    Serializes logins per account (threads + processes).
+    Advisory flock: released by the OS if the holder dies, waiters wake at once.
+    """
+    return file_mutex(LOCKS_DIR / f"{username}.lock")
 
 def session_file(username: str) -> Path:
     return SESSIONS_DIR / f"{username}.json"
@@ -67,7 +50,7 @@ def load_session(username: str) -> Optional[Client]:
     except:
         return None
 
-    cl = Client()
+    cl = attach(Client())
 
     # FIXED: Always set same stable device BEFORE loading settings
     cl.set_device(STABLE_DEVICE)
@@ -94,11 +77,16 @@ def login_with_password(username: str, password: str, trust_session: bool = True
         return cl
 
     # locking system
-    if not _acquire_lock(username):
-        raise RuntimeError("Login lock busy")
+    path = session_file(username)
+    before = path.stat().st_mtime if path.exists() else None
+    with login_lock(username):
+        # someone else logged this account in while we waited → reuse it
+        if path.exists() and path.stat().st_mtime != before:
+            cl = load_session(username)
+            if cl:
+                return cl
 
-    try:
-        cl = Client()
+        cl = attach(Client())
 
         # FIXED: ALWAYS USE SAME DEVICE (no random device)
         cl.set_device(STABLE_DEVICE)
@@ -116,5 +104,29 @@ def login_with_password(username: str, password: str, trust_session: bool = True
         print(f"[account_manager] Password login successful for {username}")
         return cl
 
-    finally:
-        _release_lock(username)
+def relogin(username: str, path, password: str) -> Client:
+    """
+    Fresh password login for an expired session, written back to the same file.
+    Keeps the old device/uuids so Instagram sees the same phone.
+    """
+    path = Path(path)
+
+    with login_lock(username):
+        cl = attach(Client())
+
+        old = {}
+        if path.exists():
+            try:
+                old = json.loads(path.read_text(encoding="utf8"))
+            except ValueError:
+                pass
+
+        if old.get("uuids"):
+            cl.set_uuids(old["uuids"])
+        cl.set_device(old.get("device_settings") or STABLE_DEVICE)
+
+        cl.login(username, password, relogin=True)
+        cl.dump_settings(path)
+
+        print(f"[account_manager] Session refreshed for {username} → {path}")
+        return cl
@@ -0,0 +1,173 @@
+# ==============================================
+# ACCOUNT REGISTRY (accounts.json + sessions/ + root session_*.json)
+# ==============================================
+#
+# Account state used to live in three places, and every entry point
+# re-read and re-parsed it on each call:
+#   - accounts.json                  (app.py: username, session_file, spacing)
+#   - sessions/<user>.json           (account_manager)
+#   - session_<user>.json in the root (post_*_all, send_dm, follow_user ...)
+# The registry merges them into one in-memory index. Each lookup only
+# stats the sources; the index is rebuilt when accounts.json or sessions/
+# change, or when the set of root session_*.json files changes (the root
+# is only re-listed when its mtime moves, other files there don't count).
+#
+#   from account_registry import registry
+#   registry.get("tej123200")["session_file"]
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).parent
+ACCOUNTS_FILE = BASE_DIR / "accounts.json"
+SESSIONS_DIR = BASE_DIR / "sessions"
+HEALTH_FILE = BASE_DIR / "logs" / "account_health.json"
+ROOT_SESSION_PREFIX = "session_"
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def username_from_session(session_file) -> str:
+    """session_<user>.json / sessions/<user>.json → <user>"""
+    stem = Path(session_file).stem
+    return stem[len(ROOT_SESSION_PREFIX):] if stem.startswith(ROOT_SESSION_PREFIX) else stem
+
+
+def _resolve(session_file) -> str:
+    path = Path(session_file)
+    return str(path if path.is_absolute() else BASE_DIR / path)
+
+
+class AccountRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._accounts: Dict[str, Dict] = {}        # username → account
+        self._by_session: Dict[str, str] = {}       # resolved session path → username
+        self._health_mtime = None
+        self._health: Dict[str, Dict] = {}
+        self._root_mtime = None
+        self._root_sessions = frozenset()           # names of root session_*.json files
+
+    # ---------- index ----------
+    def _root_session_names(self) -> frozenset:
+        # the root also holds the job db, logs, renders ...: only the session names matter
+        mtime = _mtime(BASE_DIR)
+        if mtime != self._root_mtime:
+            self._root_sessions = frozenset(p.name for p in BASE_DIR.glob(f"{ROOT_SESSION_PREFIX}*.json"))
+            self._root_mtime = mtime
+        return self._root_sessions
+
+    def _sources_signature(self) -> tuple:
+        # sessions/ mtime changes when session files are added / removed
+        return _mtime(ACCOUNTS_FILE), _mtime(SESSIONS_DIR), self._root_session_names()
+
+    def _rebuild(self):
+        accounts: Dict[str, Dict] = {}
+
+        # lowest priority first; later sources override earlier ones
+        for path in (BASE_DIR / name for name in sorted(self._root_sessions)):
+            username = username_from_session(path)
+            accounts[username] = {"username": username, "session_file": str(path), "source": "root"}
+
+        if SESSIONS_DIR.is_dir():
+            for path in SESSIONS_DIR.glob("*.json"):
+                accounts[path.stem] = {"username": path.stem, "session_file": str(path), "source": "sessions"}
+
+        if ACCOUNTS_FILE.exists():
+            try:
+                listed = json.loads(ACCOUNTS_FILE.read_text(encoding="utf8"))
+            except ValueError as e:
+                print(f"[account_registry] ❌ Bad accounts.json: {e}")
+                listed = []
+            for entry in listed:
+                account = dict(entry, source="accounts.json")
+                account["session_file"] = _resolve(entry["session_file"])
+                accounts[entry["username"]] = account
+
+        self._accounts = accounts
+        self._by_session = {str(Path(a["session_file"]).resolve()): u for u, a in accounts.items()}
+
+    def _fresh(self):
+        signature = self._sources_signature()
+        if signature != self._signature:
+            self._rebuild()
+            self._signature = signature
+
+    # ---------- lookups ----------
+    def all(self, listed_only: bool = False) -> List[Dict]:
+        """Every known account (accounts.json ones first). listed_only → accounts.json only."""
+        with self._lock:
+            self._fresh()
+            accounts = list(self._accounts.values())
+        accounts.sort(key=lambda a: a["source"] != "accounts.json")
+        return [a for a in accounts if a["source"] == "accounts.json"] if listed_only else accounts
+
+    def get(self, username: str) -> Optional[Dict]:
+        with self._lock:
+            self._fresh()
+            return self._accounts.get(username)
+
+    def session_file(self, username: str) -> Optional[str]:
+        account = self.get(username)
+        return account["session_file"] if account else None
+
+    def by_session(self, session_file) -> Dict:
+        """Account for a session file; unknown files get a synthetic entry."""
+        key = str(Path(_resolve(session_file)).resolve())
+        with self._lock:
+            self._fresh()
+            username = self._by_session.get(key)
+            if username:
+                return self._accounts[username]
+        return {"username": username_from_session(session_file), "session_file": _resolve(session_file), "source": "adhoc"}
+
+    def spacing(self, username: str) -> Dict[str, float]:
+        """Per-action interval overrides ("spacing" in accounts.json)."""
+        account = self.get(username)
+        return (account or {}).get("spacing") or {}
+
+    def password(self, username: str) -> Optional[str]:
+        account = self.get(username) or {}
+        return account.get("password") or os.getenv(f"IG_PASSWORD_{username.upper()}")
+
+    def health(self, username: Optional[str] = None):
+        """Health records written by session_refresher (all, or one account's)."""
+        mtime = _mtime(HEALTH_FILE)
+        with self._lock:
+            if mtime != self._health_mtime:
+                try:
+                    self._health = json.loads(HEALTH_FILE.read_text(encoding="utf8"))
+                except (OSError, ValueError):
+                    self._health = {}
+                self._health_mtime = mtime
+            if username is None:
+                return dict(self._health)
+            return self._health.get(username)
+
+    # ---------- writes ----------
+    def add(self, username: str, session_file, **extra):
+        """Add or update an accounts.json entry."""
+        with self._lock:
+            listed = []
+            if ACCOUNTS_FILE.exists():
+                listed = json.loads(ACCOUNTS_FILE.read_text(encoding="utf8"))
+            listed = [a for a in listed if a.get("username") != username]
+            listed.append({"username": username, "session_file": str(session_file), **extra})
+
+            tmp = ACCOUNTS_FILE.with_suffix(".tmp")
+            tmp.write_text(json.dumps(listed, indent=2), encoding="utf8")
+            os.replace(tmp, ACCOUNTS_FILE)
+            self._signature = None
+
+
+# process-wide registry
+registry = AccountRegistry()
@@ -0,0 +1,94 @@
+# ==============================================
+# PER-ACCOUNT WORKER POOL
+# ==============================================
+#
+# One queue + worker thread per username, so accounts post concurrently
+# while each account still posts strictly one job at a time.
+# Anti-ban pacing comes from account_limiter (per account, per post type,
+# shared with every other entry point), and a global semaphore caps
+# concurrent uploads across all accounts. The semaphore is only held around
+# the upload call itself (upload_slot() in auto_scheduler.post_* / fanout),
+# so inline renders and caption generation don't block other accounts.
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+from account_limiter import account_slot
+
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", "4"))
+
+# Shared by every worker in this process
+upload_slots = threading.BoundedSemaphore(MAX_CONCURRENT_UPLOADS)
+_held = threading.local()
+
+
+@contextmanager
+def upload_slot():
+    """One global upload slot; re-entering it on the same thread is a no-op."""
+    if getattr(_held, "depth", 0):
+        _held.depth += 1
+        try:
+            yield
+        finally:
+            _held.depth -= 1
+        return
+
+    with upload_slots:
+        _held.depth = 1
+        try:
+            yield
+        finally:
+            _held.depth = 0
+
+
+class AccountWorkerPool:
+    def __init__(self, handler: Callable[[Dict], bool]):
+        """
+        handler(job) runs one job end-to-end (claim, post, mark done/failed)
+        and reports the outcome to account_limiter itself.
+        It is called while holding the account's slot; the upload inside it
+        takes a global upload slot (upload_slot()).
+        """
+        self.handler = handler
+        self._queues: Dict[str, queue.Queue] = {}
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job: Dict) -> bool:
+        """Queue a job on its account's worker. Returns False if already queued."""
+        username = job.get("username") or "_unknown"
+
+        with self._lock:
+            if job["id"] in self._queued:
+                return False
+            self._queued.add(job["id"])
+
+            q = self._queues.get(username)
+            if q is None:
+                q = self._queues[username] = queue.Queue()
+                threading.Thread(
+                    target=self._worker,
+                    args=(username, q),
+                    name=f"worker-{username}",
+                    daemon=True,
+                ).start()
+
+        q.put(job)
+        return True
+
+    def _worker(self, username: str, q: queue.Queue):
+        while True:
+            job = q.get()
+            try:
+                # waits for this account's rate limit only
+                with account_slot(username, job.get("post_type") or "post", report=False):
+                    self.handler(job)
+            except Exception as e:
+                print(f"❌ Worker error for @{username}: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(job["id"])
+                q.task_done()
@@ -1,12 +1,14 @@
-import json
 import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
 import os
 import streamlit as st
-import uuid
 
+from account_registry import registry
+from job_store import get_store, new_job, JOBS_DB
+from scheduler_metrics import read_snapshot
+from utils.encoding_profiles import DEFAULT_PROFILE, PROFILES
 
 
 def show_downloaded_posts():
@@ -33,7 +35,7 @@ def show_downloaded_posts():
 # ==========================
 
 BASE_DIR = Path(__file__).parent
-JOBS_FILE = BASE_DIR / "scheduled_jobs.json"
+store = get_store()
 
 SCRIPTS = {
     "instaloader": BASE_DIR / "instaloader.py",
@@ -91,19 +93,13 @@ def run_script(label: str, script_path: Path, args=None):
         st.error(f"❌ Error running {label}: {e}")
 
 
-def load_jobs():
-    if not JOBS_FILE.exists():
-        return []
+def load_jobs(status=None, limit=None):
     try:
-        return json.loads(JOBS_FILE.read_text(encoding="utf8"))
+        return store.list_jobs(status=status, limit=limit)
     except Exception:
         return []
 
 
-def save_jobs(jobs):
-    JOBS_FILE.write_text(json.dumps(jobs, ensure_ascii=False, indent=2), encoding="utf8")
-
-
 def status_badge(status: str) -> str:
     css_class = STATUS_COLORS.get(status, "badge-pending")
     label = status.upper()
@@ -301,12 +297,14 @@ st.sidebar.caption("Pipeline: Download → Filter → Watermark → AI → Ready
 # COMMON DATA
 # ==========================
 
-jobs = load_jobs()
-total_jobs = len(jobs)
-pending_jobs = sum(1 for j in jobs if j.get("status") == "pending")
-running_jobs = sum(1 for j in jobs if j.get("status") == "running")
-failed_jobs = sum(1 for j in jobs if j.get("status") == "failed")
-done_jobs = sum(1 for j in jobs if j.get("status") == "done")
+# same numbers scheduler_runner exports; recount only if no runner is up
+metrics_snapshot = read_snapshot()
+status_counts = (metrics_snapshot or {}).get("queue") or store.count_by_status()
+total_jobs = sum(status_counts.values())
+pending_jobs = status_counts.get("pending", 0)
+running_jobs = status_counts.get("running", 0)
+failed_jobs = status_counts.get("failed", 0)
+done_jobs = status_counts.get("done", 0)
 
 
 # ==========================
@@ -315,8 +313,6 @@ done_jobs = sum(1 for j in jobs if j.get("status") == "done")
 
 
 # ---------------- CONFIG ----------------
-ACCOUNTS_FILE = "accounts.json"
-JOBS_FILE = "scheduled_jobs.json"
 UPLOAD_DIR = Path("posts/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -325,10 +321,8 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # st.title("📸 Instagram Automation Panel")
 
 # ---------------- LOAD ACCOUNTS ----------------
-if Path(ACCOUNTS_FILE).exists():
-    accounts = json.loads(Path(ACCOUNTS_FILE).read_text())
-else:
-    accounts = []
+# accounts.json + sessions/ + root session_*.json, cached until a file changes
+accounts = registry.all()
 
 # ---------------- ADD ACCOUNT ----------------
 # st.subheader("🔐 Add Instagram Account")
@@ -372,11 +366,8 @@ if st.button("🔐 Create Session File"):
             cl.dump_settings(session_filename)
 
             # ✅ Add to accounts.json automatically
-            accounts.append({
-                "username": new_username,
-                "session_file": session_filename
-            })
-            Path(ACCOUNTS_FILE).write_text(json.dumps(accounts, indent=2))
+            registry.add(new_username, session_filename)
+            accounts = registry.all()
 
             st.success(f"✅ Session created & saved as {session_filename}")
             st.info("ℹ️ Account added to account selector")
@@ -394,10 +385,17 @@ if not accounts:
 
 st.subheader("👥 Select Accounts (Multiple)")
 
+
+def account_label(acc):
+    """username, flagged if session_refresher found the session unhealthy"""
+    status = (registry.health(acc["username"]) or {}).get("status", "ok")
+    return acc["username"] if status == "ok" else f"{acc['username']} ⚠ {status}"
+
+
 selected_accounts = st.multiselect(
     "Choose accounts to post",
     options=accounts,
-    format_func=lambda x: x["username"]
+    format_func=account_label
 )
 
 if not selected_accounts:
@@ -489,6 +487,13 @@ post_type = st.selectbox(
     index=1
 )
 
+encoding_profile = st.selectbox(
+    "🎞 Video encoding profile",
+    list(PROFILES),
+    index=list(PROFILES).index(DEFAULT_PROFILE),
+    help="fast = quick render / smaller upload, archival = best quality / slowest"
+)
+
 # ---------------- SCHEDULE POST ----------------
 st.divider()
 st.subheader("⏰ Schedule Post")
@@ -501,23 +506,17 @@ with st.form("schedule_form"):
 if submit_schedule and file_path:
     run_at = datetime.combine(date, time_).isoformat()
 
-    jobs = []
-    if Path(JOBS_FILE).exists():
-        jobs = json.loads(Path(JOBS_FILE).read_text())
-
-    for acc in selected_accounts:
-        job = {
-            "id": uuid.uuid4().hex,
-            "username": acc["username"],
-            "session_file": acc["session_file"],
-            "post_type": str(post_type).lower(),
-            "media_path": str(file_path),
-            "scheduled_time": run_at,
-            "status": "pending"
-        }
-        jobs.append(job)
-
-    Path(JOBS_FILE).write_text(json.dumps(jobs, indent=2))
+    store.add_jobs([
+        new_job(
+            acc["username"],
+            str(file_path),
+            run_at,
+            post_type=str(post_type).lower(),
+            session_file=acc["session_file"],
+            encoding_profile=encoding_profile,
+        )
+        for acc in selected_accounts
+    ])
 
     st.success("✅ Scheduled successfully")
     st.info("ℹ️ Scheduler runner will post automatically")
@@ -533,46 +532,66 @@ post_now = st.button("🚀 Post Now")
 # ---------------- POST NOW ----------------
 import shutil
 from pathlib import Path
-from utils.watermark_video import add_story_watermark
+from render_service import get_service
 from auto_scheduler import post_reel, post_story, post_image
+from fanout import fan_out
 
 
 if post_now and file_path:
 
     original_path = Path(file_path)
-
-    for acc in selected_accounts:
+    action = post_type.lower()
+    render_video = original_path.suffix.lower() == ".mp4" and action != "image"
+
+    # 🔹 STEP 1+2: decode the video once, one watermarked file per @username (no copies)
+    rendered = {}
+    if render_video:
+        with st.spinner(f"Watermarking for {len(selected_accounts)} account(s)..."):
+            try:
+                rendered = get_service().submit(
+                    str(original_path),
+                    [f"@{acc['username']}" for acc in selected_accounts],
+                    profile=encoding_profile
+                ).result()
+            except Exception as e:
+                st.error(f"❌ Watermark failed: {e}")
+                st.stop()
+
+    def prepare(acc):
         username = acc["username"]
-        session_file = acc["session_file"]
 
-        try:
-            # 🔹 STEP 1: create UNIQUE copy per account
-            unique_video = original_path.with_name(
-                f"{original_path.stem}_{username}{original_path.suffix}"
-            )
+        # already carries @username (provenance sidecar) → post_* won't re-render it
+        if render_video:
+            return rendered[f"@{username}"]["source"]
 
-            shutil.copy(original_path, unique_video)
-
-            # 🔹 STEP 2: apply watermark WITH CORRECT USERNAME
-            wm_video = add_story_watermark(
-                str(unique_video),
-                watermark_text=f"@{username}"
-            )
+        # images: UNIQUE copy per account, post_* watermarks it with @username
+        unique_copy = original_path.with_name(
+            f"{original_path.stem}_{username}{original_path.suffix}"
+        )
+        shutil.copy(original_path, unique_copy)
+        return str(unique_copy)
 
-            # 🔹 STEP 3: post based on type
-            if post_type.lower() == "reel":
-                post_reel(session_file, wm_video, username)
+    def upload(acc, media):
+        username = acc["username"]
+        session_file = acc["session_file"]
 
-            elif post_type.lower() == "story":
-                post_story(session_file, wm_video)
+        # 🔹 STEP 3: post based on type (runs inside the account's slot)
+        if action == "reel":
+            post_reel(session_file, media, username, profile=encoding_profile)
 
-            else:
-                post_image(session_file, str(unique_video), username)
+        elif action == "story":
+            post_story(session_file, media, username, profile=encoding_profile)
 
-            st.success(f"✅ Posted to @{username}")
+        else:
+            post_image(session_file, media, username)
 
-        except Exception as e:
-            st.error(f"❌ Failed for @{username}: {e}")
+    # all selected accounts at once; each result shows up as soon as it finishes
+    with st.spinner(f"Posting to {len(selected_accounts)} account(s)..."):
+        for r in fan_out(selected_accounts, action, upload, prepare):
+            if r["ok"]:
+                st.success(f"✅ Posted to @{r['username']}")
+            else:
+                st.error(f"❌ Failed for @{r['username']}: {r['error']}")
 
 
 
@@ -736,8 +755,7 @@ elif page == "📥 Downloaded Posts":
     )
 
     st.markdown("### ⏱ Upcoming Jobs")
-    upcoming = [j for j in jobs if j.get("status") in ("pending", "failed")]
-    upcoming = sorted(upcoming, key=parse_time)
+    upcoming = load_jobs(status=("pending", "failed"), limit=10)
 
     if not upcoming:
         st.info("No pending or failed jobs. All clear ✅")
@@ -880,7 +898,7 @@ elif page == "5) Bulk Scheduler":
         <div class="glass-card">
           <div class="section-title">Create jobs from final_ready_to_post</div>
           <div class="section-sub">
-            Runs <code>auto_bulk_scheduler.py</code> and appends jobs into <code>scheduled_jobs.json</code>.
+            Runs <code>auto_bulk_scheduler.py</code> and inserts jobs into the job store.
           </div>
         </div>
         """,
@@ -890,7 +908,7 @@ elif page == "5) Bulk Scheduler":
         run_script("Auto Bulk Scheduler", SCRIPTS["auto_bulk"])
 
     st.markdown("### Jobs summary")
-    st.write(f"Jobs file: `{JOBS_FILE}`")
+    st.write(f"Job store: `{JOBS_DB}`")
     st.write(f"Total jobs: {total_jobs}, Pending: {pending_jobs}, Done: {done_jobs}, Failed: {failed_jobs}")
 
 # ==========================
@@ -902,7 +920,7 @@ elif page == "6) Jobs Monitor":
 
     st.info(
         "Posting actually runs from `scheduler_runner.py` via Windows Task Scheduler. "
-        "This page is a live view / manual editor for `scheduled_jobs.json`."
+        "This page is a live view / manual editor for the job store."
     )
 
     filter_status = st.selectbox(
@@ -911,9 +929,7 @@ elif page == "6) Jobs Monitor":
         index=0,
     )
 
-    filtered = jobs
-    if filter_status != "all":
-        filtered = [j for j in jobs if j.get("status") == filter_status]
+    filtered = load_jobs(status=None if filter_status == "all" else filter_status)
 
     if not filtered:
         st.info("No jobs for this filter.")
@@ -948,6 +964,23 @@ elif page == "6) Jobs Monitor":
                 unsafe_allow_html=True,
             )
 
+    st.markdown("### Scheduler metrics")
+    if not metrics_snapshot:
+        st.info("No recent metrics snapshot (is scheduler_runner.py running?)")
+    else:
+        lag = metrics_snapshot["queue_lag"]
+        st.write(
+            f"Queue lag: avg {lag['avg']:.1f}s · max {lag['max']:.1f}s "
+            f"over {lag['count']} jobs · updated {metrics_snapshot['updated_at']}"
+        )
+        if metrics_snapshot["stages"]:
+            st.table({
+                stage: {"count": v["count"], "avg (s)": round(v["avg"], 2), "max (s)": round(v["max"], 2)}
+                for stage, v in metrics_snapshot["stages"].items()
+            })
+        if metrics_snapshot["jobs_per_minute"]:
+            st.write("Jobs / minute:", metrics_snapshot["jobs_per_minute"])
+
     st.markdown("### Manual status update")
     colA, colB, colC = st.columns(3)
     with colA:
@@ -962,15 +995,8 @@ elif page == "6) Jobs Monitor":
             if not target_id.strip():
                 st.error("Enter job ID.")
             else:
-                jobs2 = load_jobs()
-                ok = False
-                for job in jobs2:
-                    if job["id"] == target_id.strip():
-                        job["status"] = new_status
-                        ok = True
-                        break
+                ok = store.update_job(target_id.strip(), status=new_status)
                 if ok:
-                    save_jobs(jobs2)
                     st.success("Job updated.")
                     st.experimental_rerun()
                 else:
@@ -989,7 +1015,7 @@ else:
           <div class="section-title">Paths</div>
           <div class="section-sub">
             <code>Base dir:</code> {BASE_DIR}<br>
-            <code>Jobs file:</code> {JOBS_FILE}
+            <code>Job store:</code> {JOBS_DB}
           </div>
         </div>
         """,
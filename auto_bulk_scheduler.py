@@ -2,42 +2,27 @@
 # AUTO BULK SCHEDULER (FULLY OPTIMIZED VERSION)
 # ==============================================
 
-import uuid
-import json
+import os
 from datetime import datetime, timedelta
 from pathlib import Path
 
-JOBS_FILE = Path("scheduled_jobs.json")
+from job_store import get_store, new_job
 
+MEDIA_EXTENSIONS = (".mp4", ".jpg", ".jpeg", ".png")
 
-# ---------------------------------------
-# Load existing jobs
-# ---------------------------------------
-def load_jobs():
-    if not JOBS_FILE.exists():
-        return []
-    try:
-        return json.loads(JOBS_FILE.read_text(encoding="utf8"))
-    except:
-        print("❌ ERROR: scheduled_jobs.json corrupted.")
-        return []
-
-
-# ---------------------------------------
-# Save jobs
-# ---------------------------------------
-def save_jobs(jobs):
-    JOBS_FILE.write_text(json.dumps(jobs, ensure_ascii=False, indent=2), encoding="utf8")
+# Jobs are committed in chunks, so a crash mid-run keeps finished chunks
+BATCH_SIZE = 500
 
 
 # ---------------------------------------
-# Utility: check duplicate job
+# Utility: first media file in a post folder
 # ---------------------------------------
-def job_exists(jobs, media_path: str):
-    for j in jobs:
-        if j.get("media_path") == media_path:
-            return True
-    return False
+def find_media(folder: Path):
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.lower().endswith(MEDIA_EXTENSIONS) and entry.is_file():
+                return str(folder / entry.name)
+    return None
 
 
 # ---------------------------------------
@@ -48,20 +33,14 @@ def auto_create_jobs(
     username,
     password=None,
     start_time="2025-02-25 10:00",
-    gap_minutes=30
+    gap_minutes=30,
+    encoding_profile=None
 ):
     base = Path(base_folder)
     if not base.exists():
         print("❌ Base folder not found:", base_folder)
         return
 
-    folders = sorted([f for f in base.iterdir() if f.is_dir()])
-    if not folders:
-        print("❌ No post folders found.")
-        return
-
-    jobs = load_jobs()
-
     # Validate username
     if not username or len(username) < 2:
         print("❌ Invalid username.")
@@ -80,20 +59,30 @@ def auto_create_jobs(
         print("⚠ start_time was in past → adjusting to future automatically.")
         dt = now + timedelta(minutes=1)
 
-    print(f"\n🔍 Scanning {len(folders)} folders...")
+    store = get_store()
+
+    # hash index over every queued media_path → O(1) duplicate checks
+    known_media = store.media_paths()
+
+    print(f"\n🔍 Scanning {base} ({len(known_media)} media already queued)...")
     print("Auto-creating jobs. Please wait...\n")
 
+    scanned = 0
     created = 0
     skipped = 0
+    first_time = None
+    batch = []
+
+    # sorted names keep the folder → time slot assignment stable between runs
+    with os.scandir(base) as it:
+        names = sorted(entry.name for entry in it if entry.is_dir())
 
-    for folder in folders:
-        media = None
+    for name in names:
+        scanned += 1
+        folder = base / name
 
         # detect one media file
-        for file in folder.iterdir():
-            if file.suffix.lower() in [".mp4", ".jpg", ".jpeg", ".png"]:
-                media = str(file)
-                break
+        media = find_media(folder)
 
         if not media:
             print(f"⚠ SKIPPED: No media found → {folder.name}")
@@ -101,51 +90,57 @@ def auto_create_jobs(
             continue
 
         # Skip if already exists
-        if job_exists(jobs, media):
+        if media in known_media:
             print(f"⚠ SKIPPED: Job already exists → {folder.name}")
             skipped += 1
             continue
+        known_media.add(media)
 
         # caption detect
         caption_file = folder / "final_caption.txt"
         caption_path = str(caption_file) if caption_file.exists() else None
 
         # Create job
-        job = {
-            "id": str(uuid.uuid4()),
-            "username": username,
-            "password": password,
-            "media_path": media,
-            "caption_path": caption_path,
-            "caption": None,  # keep override empty
-
-            "scheduled_time": dt.strftime("%Y-%m-%d %H:%M"),
-            "status": "pending",
-            "retries": 0,
-            "type": None,
-            "created_at": datetime.now().isoformat(),
-        }
-
-        jobs.append(job)
+        job = new_job(
+            username,
+            media,
+            dt.strftime("%Y-%m-%d %H:%M"),
+            password=password,
+            caption_path=caption_path,
+            caption=None,  # keep override empty
+            type=None,
+            encoding_profile=encoding_profile,  # None → DEFAULT_PROFILE at render time
+        )
+
+        batch.append(job)
         created += 1
+        first_time = first_time or job["scheduled_time"]
 
         print(f"✔ Job added: {folder.name} → {job['scheduled_time']}")
 
         # move to next time slot
         dt += timedelta(minutes=gap_minutes)
 
-    save_jobs(jobs)
+        if len(batch) >= BATCH_SIZE:
+            store.add_jobs(batch)
+            batch = []
+
+    store.add_jobs(batch)
+
+    if not scanned:
+        print("❌ No post folders found.")
+        return
 
     # Final summary
     print("\n=====================================")
     print("           BULK JOB SUMMARY")
     print("=====================================")
-    print(f"📌 Total folders scanned: {len(folders)}")
+    print(f"📌 Total folders scanned: {scanned}")
     print(f"📌 Jobs created: {created}")
     print(f"📌 Skipped folders: {skipped}")
 
     if created > 0:
-        print(f"⏱ First post:  {jobs[-created]['scheduled_time']}")
+        print(f"⏱ First post:  {first_time}")
         print(f"⏱ Last post:   {dt.strftime('%Y-%m-%d %H:%M')}")
     print("=====================================\n")
 
@@ -1,14 +1,23 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 from caption_hashtag import generate_caption, generate_hashtags
-from watermark_video import add_watermark
+from watermark_video import add_video_watermark as add_watermark
 
 
 INPUT_VIDEO = sys.argv[1]
 USERNAME = sys.argv[2]
 
+SESSION_FILE = "session_account3.json"
+SENDER = sys.argv[3] if len(sys.argv) > 3 else None   # optional: which of our accounts to use
+
 OUTPUT_VIDEO = "final_reel.mp4"
 
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
+
 # 1️⃣ Watermark add
 add_watermark(INPUT_VIDEO, OUTPUT_VIDEO, USERNAME)
 
@@ -18,14 +27,12 @@ hashtags = generate_hashtags()
 final_caption = caption + "\n\n" + hashtags
 
 # 3️⃣ Instagram upload
-cl = Client()
-cl.load_settings("session_account3.json")
-
-print("✅ Session loaded")
+with account_slot(account["username"], "reel"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
 
-cl.video_upload(
-    OUTPUT_VIDEO,
-    caption=final_caption
-)
+    cl.video_upload(
+        OUTPUT_VIDEO,
+        caption=final_caption
+    )
 
 print("🎬 Reel uploaded with caption + hashtags + watermark")
@@ -1,68 +1,105 @@
-from instagrapi import Client
-from utils.watermark_image import add_watermark_to_image
-from utils.watermark_video import add_story_watermark
+import os
+
+from account_workers import upload_slot
+from client_pool import pool
+from render_service import get_service
+from utils import media_provenance
 from caption_hashtag import generate_caption_and_hashtags
+from scheduler_metrics import metrics
+
+CAPTION_CONTEXT = {
+    "image": "This post shows an amazing moment captured on camera.",
+    "reel": "This reel shows a creative and inspiring video clip.",
+}
+
 
 def get_client(session_file):
-    cl = Client()
-    cl.load_settings(session_file)
+    """Pooled client for this session (health-checked at most every CLIENT_HEALTH_TTL)."""
+    with metrics.stage("get_client"):
+        return pool.get(session_file)
+
+
+def build_caption(username, post_type):
+    """Groq caption + hashtags for a post (stories have no caption)."""
+    if post_type not in CAPTION_CONTEXT:
+        return None
+
+    with metrics.stage("caption"):
+        caption_text, hashtags = generate_caption_and_hashtags(
+            username,
+            CAPTION_CONTEXT[post_type]
+        )
 
-    try:
-        # ✅ This is mandatory for REELS
-        cl.get_timeline_feed()
-    except Exception as e:
-        raise Exception(f"❌ Session expired / blocked: {session_file}\n{e}")
+    return f"{caption_text}\n\n{hashtags}"
 
-    return cl
 
+def prepare_media(path, username, deadline=None, profile=None):
+    """
+    Watermark an image or video with @username (the slow part of posting).
+    Renders run in the render service's process pool, earliest deadline first
+    (None = now), videos with the given encoding profile. Media whose
+    provenance sidecar says it already carries @username is returned as-is.
+    """
+    text = f"@{username}"
+    if media_provenance.find(path, "watermark", text=text):
+        print(f"[auto_scheduler] ⏭ Already watermarked with {text}: {path}")
+        return path
 
-def post_image(session_file, image_path, username=None):
-    cl = get_client(session_file)
+    # rendered for another account → watermark the clean original instead
+    if media_provenance.find(path, "watermark"):
+        source = media_provenance.source_of(path)
+        if not os.path.exists(source):
+            raise Exception(f"❌ {path} carries another watermark and its source is gone")
+        path = source
+
+    with metrics.stage("watermark"):
+        return get_service().render(str(path), text, deadline=deadline, profile=profile)
+
+
+def post_image(session_file, image_path, username=None, caption=None, watermark=True):
+    get_client(session_file)
 
     if username is None:
-        username = cl.account_info().username
+        username = pool.username(session_file)
 
-    caption_text, hashtags = generate_caption_and_hashtags(
-        username,
-        "This post shows an amazing moment captured on camera."
-    )
+    if caption is None:
+        caption = build_caption(username, "image")
 
-    caption = f"{caption_text}\n\n{hashtags}"
+    wm = prepare_media(image_path, username) if watermark else image_path
 
-    wm = add_watermark_to_image(image_path, f"@{username}")
-    cl.photo_upload(wm, caption)
+    with upload_slot(), pool.lease(session_file) as cl, metrics.stage("upload"):
+        cl.photo_upload(wm, caption)
 
 
-def post_reel(session_file, video_path, username=None):
-    cl = get_client(session_file)
+def post_reel(session_file, video_path, username=None, caption=None, watermark=True, profile=None):
+    get_client(session_file)
 
     if username is None:
-        username = cl.account_info().username
+        username = pool.username(session_file)
 
-    caption_text, hashtags = generate_caption_and_hashtags(
-        username,
-        "This reel shows a creative and inspiring video clip."
-    )
+    if caption is None:
+        caption = build_caption(username, "reel")
 
-    caption = f"{caption_text}\n\n{hashtags}"
+    wm_video = prepare_media(video_path, username, profile=profile) if watermark else video_path
 
-    wm_video = add_story_watermark(video_path, f"@{username}")
-    cl.clip_upload(wm_video, caption)
+    with upload_slot(), pool.lease(session_file) as cl, metrics.stage("upload"):
+        cl.clip_upload(wm_video, caption)
 
 
-def post_story(session_file, path, username=None):
-    cl = get_client(session_file)
+def post_story(session_file, path, username=None, watermark=True, profile=None):
+    get_client(session_file)
 
-    # If username not passed, fetch from account
+    # If username not passed, fetch from account (cached by the pool)
     if username is None:
-        username = cl.account_info().username
-
-    if path.lower().endswith((".jpg", ".png")):
-        wm = add_watermark_to_image(path, f"@{username}")
-        cl.photo_upload_to_story(wm)
-    else:
-        wm_video = add_story_watermark(path, f"@{username}")
-        cl.video_upload_to_story(wm_video)
+        username = pool.username(session_file)
+
+    media = prepare_media(path, username, profile=profile) if watermark else path
+
+    with upload_slot(), pool.lease(session_file) as cl, metrics.stage("upload"):
+        if str(media).lower().endswith((".jpg", ".jpeg", ".png")):
+            cl.photo_upload_to_story(media)
+        else:
+            cl.video_upload_to_story(media)
 
 
 
@@ -0,0 +1,134 @@
+# ==============================================
+# INSTAGRAPI CLIENT POOL (one live Client per session file)
+# ==============================================
+#
+# auto_scheduler used to build a fresh Client, reparse the session JSON and
+# call get_timeline_feed() for every single post. The pool keeps one Client
+# per session file for the whole process:
+#   - health check (get_timeline_feed) only when older than CLIENT_HEALTH_TTL
+#   - refreshed cookies written back with dump_settings after each use
+#   - evicted on auth errors, reloaded if the session file changes on disk
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from instagrapi import Client
+
+from account_registry import registry
+from http_transport import attach
+from retry_policy import classify_error
+
+CLIENT_HEALTH_TTL = int(os.getenv("CLIENT_HEALTH_TTL", "600"))  # seconds
+
+
+class _Entry:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.client: Optional[Client] = None
+        self.username: Optional[str] = None
+        self.checked_at = 0.0
+        self.mtime = 0.0
+
+
+class ClientPool:
+    def __init__(self, health_ttl: int = CLIENT_HEALTH_TTL):
+        self.health_ttl = health_ttl
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, session_file) -> _Entry:
+        key = str(Path(session_file).resolve())
+        with self._lock:
+            return self._entries.setdefault(key, _Entry())
+
+    def _mtime(self, session_file) -> float:
+        try:
+            return os.stat(session_file).st_mtime
+        except OSError:
+            return 0.0
+
+    def _ensure(self, session_file, entry: _Entry) -> Client:
+        mtime = self._mtime(session_file)
+
+        # (re)load if new, evicted, or the file was rewritten by someone else
+        if entry.client is None or mtime != entry.mtime:
+            cl = attach(Client())   # shared keep-alive pools, own cookies
+            cl.load_settings(session_file)
+            entry.client, entry.mtime, entry.checked_at = cl, mtime, 0.0
+
+        if time.monotonic() - entry.checked_at > self.health_ttl:
+            try:
+                # ✅ This is mandatory for REELS
+                entry.client.get_timeline_feed()
+            except Exception as e:
+                entry.client = None
+                raise Exception(f"❌ Session expired / blocked: {session_file}\n{e}") from e
+            entry.checked_at = time.monotonic()
+
+        return entry.client
+
+    def get(self, session_file) -> Client:
+        """Pooled, health-checked client (caller must not share it across threads)."""
+        entry = self._entry(session_file)
+        with entry.lock:
+            return self._ensure(session_file, entry)
+
+    def check(self, session_file) -> Client:
+        """Force a health check now (used by session_refresher off the hot path)."""
+        entry = self._entry(session_file)
+        with entry.lock:
+            entry.checked_at = 0.0
+            return self._ensure(session_file, entry)
+
+    def username(self, session_file) -> str:
+        """Account username from the registry, else fetched once per pooled client."""
+        entry = self._entry(session_file)
+        with entry.lock:
+            if entry.username is None:
+                account = registry.by_session(session_file)
+                if account["source"] != "adhoc":
+                    entry.username = account["username"]
+                else:
+                    entry.username = self._ensure(session_file, entry).account_info().username
+            return entry.username
+
+    def save(self, session_file):
+        """Write refreshed settings (cookies, claims) back to the session file."""
+        entry = self._entry(session_file)
+        with entry.lock:
+            if entry.client is not None:
+                entry.client.dump_settings(session_file)
+                entry.mtime = self._mtime(session_file)
+
+    def evict(self, session_file):
+        entry = self._entry(session_file)
+        with entry.lock:
+            entry.client = None
+            entry.checked_at = 0.0
+
+    @contextmanager
+    def lease(self, session_file):
+        """
+        Exclusive use of the pooled client for one operation.
+        Success → settings saved; auth error → client evicted.
+        """
+        entry = self._entry(session_file)
+        with entry.lock:
+            cl = self._ensure(session_file, entry)
+            try:
+                yield cl
+            except Exception as e:
+                if classify_error(e) == "session":
+                    self.evict(session_file)
+                raise
+            else:
+                entry.checked_at = time.monotonic()   # a successful call is a health check
+                self.save(session_file)
+
+
+# process-wide pool
+pool = ClientPool()
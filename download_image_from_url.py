@@ -1,15 +1,20 @@
-from instagrapi import Client
+import sys
+from account_registry import registry
+from client_pool import pool
 
 SESSION = "session_account5.json"
 POST_URL = "https://www.instagram.com/p/DSnm06fEnO2/"
+SENDER = sys.argv[1] if len(sys.argv) > 1 else None   # optional: which of our accounts to use
 
-cl = Client()
-cl.load_settings(SESSION)
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-media_pk = cl.media_pk_from_url(POST_URL)
-media = cl.media_info(media_pk)
+with pool.lease(account["session_file"]) as cl:
+    media_pk = cl.media_pk_from_url(POST_URL)
+    media = cl.media_info(media_pk)
 
-# download image
-cl.photo_download(media_pk, folder="posts")
+    # download image
+    cl.photo_download(media_pk, folder="posts")
 
 print("✅ Image downloaded successfully")
@@ -0,0 +1,62 @@
+# ==============================================
+# MULTI-ACCOUNT FAN-OUT (one media item → N accounts, concurrently)
+# ==============================================
+#
+# "Post Now" and post_*_all used to handle accounts one after another, so
+# 10 accounts took the sum of 10 renders + uploads. fan_out() runs every
+# account in a thread pool:
+#   prepare(account)          → outside any lock (watermark, caption ...)
+#   upload(account, prepared) → inside account_slot (per-account mutex +
+#                               pacing) and one global upload slot
+# and yields per-account results as they complete.
+#
+#   for r in fan_out(accounts, "reel", upload, prepare):
+#       print(r["username"], r["ok"], r["error"])
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from account_limiter import account_slot
+from account_workers import upload_slot
+
+# threads mostly wait on pacing / network; uploads are capped by upload_slot()
+FANOUT_MAX_THREADS = int(os.getenv("FANOUT_MAX_THREADS", "16"))
+
+
+def _run_one(account: Dict, action: str, upload: Callable, prepare: Optional[Callable]) -> Dict:
+    username = account["username"]
+    start = time.perf_counter()
+    result = {"username": username, "account": account, "ok": False, "result": None, "error": None}
+
+    try:
+        prepared = prepare(account) if prepare else None
+        with account_slot(username, action):
+            with upload_slot():
+                result["result"] = upload(account, prepared)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = e
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+    return result
+
+
+def fan_out(
+    accounts: Iterable[Dict],
+    action: str,
+    upload: Callable[[Dict, object], object],
+    prepare: Optional[Callable[[Dict], object]] = None,
+    max_threads: int = FANOUT_MAX_THREADS,
+) -> Iterator[Dict]:
+    """Run prepare + upload for every account concurrently; yield results as they finish."""
+    accounts = list(accounts)
+    if not accounts:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_threads, len(accounts)), thread_name_prefix="fanout") as ex:
+        futures = [ex.submit(_run_one, acc, action, upload, prepare) for acc in accounts]
+        for future in as_completed(futures):
+            yield future.result()
@@ -24,10 +24,11 @@ NOTE:
 
 import os, time, json, random, math
 from pathlib import Path
-import requests
 from typing import List, Dict
 from itertools import cycle
 
+from http_transport import session as http_session
+
 # -------- CONFIG --------
 INPUT_BASE = r"C:\Users\w10\Desktop\WebScrapping\filtered_downloads_watermarked"
 # files will be written inside each post folder (per your pinned rule)
@@ -45,6 +46,9 @@ DEFAULT_MODELS = [
 
 OPENROUTER_CHAT_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# one keep-alive pool per provider host instead of a new TLS handshake per call
+HTTP = http_session("api")
+
 
 def safe_retry(func, fallback_text):
     for _ in range(3):
@@ -150,7 +154,7 @@ def send_request_openrouter(model: str, api_key: str, user_prompt: str, max_toke
         "temperature": temperature,
     }
     try:
-        r = requests.post(OPENROUTER_CHAT_URL, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+        r = HTTP.post(OPENROUTER_CHAT_URL, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
         r.raise_for_status()
         data = r.json()
         # openrouter style: data['choices'][0]['message']['content'] often
@@ -210,7 +214,7 @@ def call_openrouter(model, prompt):
         api_key = next(key_cycle)
 
         try:
-            r = requests.post(
+            r = HTTP.post(
                 OPENROUTER_CHAT_URL,
                 headers={
                     "Authorization": f"Bearer {api_key}",
@@ -278,7 +282,7 @@ def call_openai(prompt):
         return None
 
     try:
-        r = requests.post(
+        r = HTTP.post(
             OPENAI_URL,
             headers={
                 "Authorization": f"Bearer {OPENAI_KEY}",
@@ -335,7 +339,7 @@ def call_gemini(prompt):
         return None
 
     try:
-        r = requests.post(
+        r = HTTP.post(
             GEMINI_URL,
             headers={"Content-Type": "application/json"},
             json={"contents": [{"parts": [{"text": prompt}]}]},
@@ -0,0 +1,75 @@
+# ==============================================
+# CROSS-PROCESS FILE MUTEX (advisory lock + in-process lock)
+# ==============================================
+#
+# flock (msvcrt on Windows) on a lock file, plus one threading.Lock per
+# lock file for threads of the same process. The OS drops the lock when
+# the holder dies, so a crashed process never leaves a stale lock behind,
+# and a blocked waiter wakes as soon as the lock is released.
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_fd(fd, wait=True):
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not wait:
+                    return False
+
+    def _unlock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(fd, wait=True):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class LockBusy(RuntimeError):
+    """file_mutex(wait=False) found the lock held by someone else."""
+
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_mutex(path, wait: bool = True):
+    """Only one holder of `path` across threads and processes."""
+    path = Path(path)
+    with _thread_locks_guard:
+        tlock = _thread_locks.setdefault(str(path.resolve()), threading.Lock())
+
+    if not tlock.acquire(blocking=wait):
+        raise LockBusy(str(path))
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_CREAT | os.O_RDWR)
+        try:
+            if not _lock_fd(fd, wait):
+                raise LockBusy(str(path))
+            try:
+                yield
+            finally:
+                _unlock_fd(fd)
+        finally:
+            os.close(fd)
+    finally:
+        tlock.release()
@@ -1,20 +1,26 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 # Follow cheyyali anna username
 TARGET_USERNAME = sys.argv[1]
 
-cl = Client()
+SESSION_FILE = "session_account3.json"
+SENDER = sys.argv[2] if len(sys.argv) > 2 else None   # optional: which of our accounts to use
 
-# Session load
-cl.load_settings("session_account3.json")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-print("✅ Session loaded")
+# Session load (pooled client)
+with account_slot(account["username"], "follow"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
 
-# Username → User ID
-user_id = cl.user_id_from_username(TARGET_USERNAME)
+    # Username → User ID
+    user_id = cl.user_id_from_username(TARGET_USERNAME)
 
-# ➕ Follow
-cl.user_follow(user_id)
+    # ➕ Follow
+    cl.user_follow(user_id)
 
 print(f"➕ Followed successfully: {TARGET_USERNAME}")
@@ -0,0 +1,111 @@
+# ==============================================
+# SHARED HTTP TRANSPORT (keep-alive pools + retries + timeouts)
+# ==============================================
+#
+# Media downloads, LLM calls and instagrapi clients used to open a fresh
+# connection (and TLS handshake) per request. Everything now goes through
+# a few process-wide requests Sessions whose adapters keep per-host
+# connection pools alive:
+#   "download" → GET media: retries on connect errors and 429/5xx
+#   "api"      → LLM / instagrapi POSTs: retries only when the request
+#                never reached the server (connect errors)
+#
+#   from http_transport import session, download, attach
+#   session("api").post(url, json=payload)
+#   download(url, "posts/uploads/x.mp4")
+#   attach(cl)   # instagrapi Client → shared pools
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))       # hosts kept in the pool cache
+POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "32"))  # ≥ concurrent workers per host
+CONNECT_TIMEOUT = 10   # seconds
+READ_TIMEOUT = 60      # seconds
+DOWNLOAD_CHUNK = 1024 * 1024
+
+RETRIES = {
+    "download": Retry(
+        total=4, backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+    "api": Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.5, allowed_methods=None),
+}
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout."""
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        return super().send(request, **kwargs)
+
+
+_adapters: Dict[str, HTTPAdapter] = {}
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def adapter(profile: str = "api") -> HTTPAdapter:
+    """Shared adapter (= connection pools) for a retry profile."""
+    with _lock:
+        if profile not in _adapters:
+            _adapters[profile] = _TimeoutAdapter(
+                pool_connections=POOL_HOSTS,
+                pool_maxsize=POOL_PER_HOST,
+                max_retries=RETRIES[profile],
+                pool_block=False,
+            )
+        return _adapters[profile]
+
+
+def mount(sess: requests.Session, profile: str = "api") -> requests.Session:
+    shared = adapter(profile)
+    sess.mount("https://", shared)
+    sess.mount("http://", shared)
+    return sess
+
+
+def session(profile: str = "api") -> requests.Session:
+    """Process-wide Session for a profile (safe to share between threads for plain requests)."""
+    with _lock:
+        sess = _sessions.get(profile)
+    if sess is None:
+        sess = mount(requests.Session(), profile)
+        with _lock:
+            sess = _sessions.setdefault(profile, sess)
+    return sess
+
+
+def attach(client):
+    """
+    Point an instagrapi Client's sessions at the shared pools.
+    Cookies and headers stay per client; only connections are shared.
+    """
+    for name in ("private", "public"):
+        sess = getattr(client, name, None)
+        if isinstance(sess, requests.Session):
+            mount(sess, "api")
+    return client
+
+
+def download(url: str, dest, chunk_size: int = DOWNLOAD_CHUNK) -> str:
+    """Stream url to dest over the shared download pool."""
+    dest = Path(dest)
+    with session("download").get(url, stream=True) as r:
+        r.raise_for_status()
+        with open(dest, "wb") as f:
+            for c in r.iter_content(chunk_size):
+                if c:
+                    f.write(c)
+    return str(dest)
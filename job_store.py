@@ -0,0 +1,565 @@
+# ==============================================
+# JOB STORE (INDEXED, TRANSACTIONAL)
+# ==============================================
+#
+# Replaces whole-file rewrites of scheduled_jobs.json.
+# Every writer (scheduler_runner, app.py, auto_bulk_scheduler) goes
+# through get_store(), so status changes are per-row and atomic.
+#
+# Backends are pluggable via JOB_STORE=<name> (default: sqlite).
+# The legacy JSON file is imported once on first use and renamed to
+# scheduled_jobs.imported.json.
+# Writes that make a job pending wake scheduler_runner (scheduler_wakeup).
+#
+# Runners claim jobs with a lease (claim / heartbeat / release), so several
+# scheduler_runner processes or hosts can share one store; jobs whose
+# worker died are put back to pending once the lease expires.
+
+import os
+import sys
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from file_lock import file_mutex
+from scheduler_wakeup import notify_scheduler
+
+BASE_DIR = Path(__file__).parent
+
+JOBS_FILE = BASE_DIR / "scheduled_jobs.json"
+JOBS_DB = Path(os.getenv("JOBS_DB", str(BASE_DIR / "scheduled_jobs.db")))
+
+JOB_STORE_BACKEND = os.getenv("JOB_STORE", "sqlite")
+
+# Fields that live in their own indexed columns (everything else stays in `data`)
+COLUMNS = (
+    "id", "username", "post_type", "media_path", "status", "scheduled_time",
+    "prepared_media", "lease_owner", "lease_expires",
+)
+
+
+# ---------------------------------------
+# Helpers
+# ---------------------------------------
+def normalize_time(value) -> Optional[str]:
+    """
+    Turn any supported time value into a sortable local ISO string.
+    Supports "2025-02-25 10:00", "2025-02-25T10:00:00", aware strings and datetimes.
+    """
+    if not value:
+        return None
+
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).strip().replace(" ", "T"))
+        except ValueError:
+            return None
+
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+
+    return dt.isoformat(timespec="seconds")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _in(seconds: float) -> str:
+    return (datetime.now() + timedelta(seconds=seconds)).isoformat(timespec="seconds")
+
+
+def new_job(username: str, media_path: str, scheduled_time, post_type: str = None, **extra) -> Dict:
+    """Build a job dict with the fields every writer is expected to set."""
+    job = {
+        "id": uuid.uuid4().hex,
+        "username": username,
+        "post_type": post_type,
+        "media_path": media_path,
+        "scheduled_time": scheduled_time,
+        "status": "pending",
+        "retries": 0,
+        "created_at": datetime.now().isoformat(),
+    }
+    job.update(extra)
+    return job
+
+
+# ---------------------------------------
+# Backend interface
+# ---------------------------------------
+class JobStore:
+    """
+    Minimal interface every job-store backend implements.
+    Job dicts keep the same shape they had in scheduled_jobs.json.
+    """
+
+    def add_job(self, job: Dict) -> Dict:
+        self.add_jobs([job])
+        return job
+
+    def add_jobs(self, jobs: Iterable[Dict]) -> int:
+        raise NotImplementedError
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list_jobs(self, status=None, limit: int = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def count_by_status(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def due_jobs(self, now=None, limit: int = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def pending_times(self, job_ids: Iterable[str] = None) -> List[tuple]:
+        """(id, scheduled_time) of pending jobs, optionally limited to `job_ids`."""
+        raise NotImplementedError
+
+    def unprepared_jobs(self, until=None, limit: int = None) -> List[Dict]:
+        """Pending jobs due before `until` with no pre-rendered media yet, earliest first."""
+        raise NotImplementedError
+
+    def transition(self, job_id: str, from_status, to_status: str, owner: str = None, **updates) -> bool:
+        raise NotImplementedError
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> Optional[Dict]:
+        """Atomically take a pending (or lease-expired running) job. None if someone else has it."""
+        raise NotImplementedError
+
+    def heartbeat(self, job_ids: Iterable[str], owner: str, lease_seconds: float) -> List[str]:
+        """Extend leases still held by `owner`. Returns the ids whose lease was lost."""
+        raise NotImplementedError
+
+    def release(self, job_id: str, owner: str, to_status: str, **updates) -> bool:
+        """Finish a claimed job (only if `owner` still holds the lease)."""
+        return self.transition(
+            job_id, "running", to_status, owner=owner,
+            lease_owner=None, lease_expires=None, **updates
+        )
+
+    def reclaim_expired(self) -> int:
+        """Put running jobs with an expired (or missing) lease back to pending."""
+        raise NotImplementedError
+
+    def update_job(self, job_id: str, **updates) -> bool:
+        raise NotImplementedError
+
+    def media_exists(self, media_path: str) -> bool:
+        raise NotImplementedError
+
+    def media_paths(self) -> set:
+        """Every media_path already queued (hash index for bulk duplicate checks)."""
+        raise NotImplementedError
+
+    def import_json(self, path=JOBS_FILE, rename: bool = True) -> int:
+        """
+        One-shot import of a legacy scheduled_jobs.json array.
+        Safe to run from several processes at once (app + scheduler_runner):
+        the import is serialized by a file lock, and id-less jobs get an id
+        derived from their content, so a repeated import is ignored by the store.
+        """
+        path = Path(path)
+        with file_mutex(path.with_suffix(".import.lock")):
+            # another process may have imported + renamed it while we waited
+            if not path.exists():
+                return 0
+
+            try:
+                jobs = json.loads(path.read_text(encoding="utf8") or "[]")
+            except Exception as e:
+                print(f"[job_store] ❌ Could not parse {path.name}: {e}")
+                return 0
+
+            for job in jobs:
+                if not job.get("id"):
+                    content = json.dumps(job, sort_keys=True, ensure_ascii=False)
+                    job["id"] = uuid.uuid5(uuid.NAMESPACE_URL, content).hex
+                job.setdefault("status", "pending")
+                if not job.get("scheduled_time") and job.get("run_at"):
+                    job["scheduled_time"] = job["run_at"]
+
+            imported = self.add_jobs(jobs)
+
+            if rename:
+                os.replace(path, path.with_suffix(".imported.json"))  # overwrites on Windows too
+
+        print(f"[job_store] ✔ Imported {imported} jobs from {path.name}")
+        return imported
+
+
+# ---------------------------------------
+# SQLite backend (default)
+# ---------------------------------------
+class SQLiteJobStore(JobStore):
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id             TEXT PRIMARY KEY,
+        username       TEXT,
+        post_type      TEXT,
+        media_path     TEXT,
+        status         TEXT NOT NULL DEFAULT 'pending',
+        scheduled_time TEXT,
+        prepared_media TEXT,
+        lease_owner    TEXT,
+        lease_expires  TEXT,
+        updated_at     TEXT,
+        data           TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_status_time ON jobs (status, scheduled_time);
+    CREATE INDEX IF NOT EXISTS idx_jobs_media_path ON jobs (media_path);
+    """
+
+    INSERT_SQL = (
+        f"INSERT OR IGNORE INTO jobs ({', '.join(COLUMNS)}, updated_at, data) "
+        f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})"
+    )
+    UPDATE_SQL = (
+        f"UPDATE jobs SET {', '.join(c + ' = ?' for c in COLUMNS[1:])}, "
+        f"updated_at = ?, data = ? WHERE id = ?"
+    )
+
+    def __init__(self, db_path=JOBS_DB):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._migrate()
+
+    def _migrate(self):
+        """Create the table and add columns introduced after a database was first created."""
+        self.conn.executescript(self.SCHEMA)
+        existing = {r["name"] for r in self.conn.execute("PRAGMA table_info(jobs)")}
+        for col in COLUMNS:
+            if col not in existing:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {col} TEXT")
+
+    # one connection per thread (sqlite3 connections are not thread-safe)
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- row <-> dict ----------
+    @staticmethod
+    def _to_row(job: Dict) -> tuple:
+        job = dict(job)
+        job["scheduled_time"] = normalize_time(job.get("scheduled_time") or job.get("run_at"))
+        job["status"] = job.get("status") or "pending"
+        return tuple(job.get(c) for c in COLUMNS) + (
+            _now(),
+            json.dumps(job, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict:
+        job = json.loads(row["data"])
+        for col in COLUMNS:
+            job[col] = row[col]
+        return job
+
+    # ---------- writes ----------
+    def add_jobs(self, jobs: Iterable[Dict]) -> int:
+        rows = []
+        for job in jobs:
+            job.setdefault("id", uuid.uuid4().hex)
+            job.setdefault("status", "pending")
+            rows.append(self._to_row(job))
+
+        if not rows:
+            return 0
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(self.INSERT_SQL, rows)
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if added:
+            notify_scheduler([r[0] for r in rows])
+        return added
+
+    def transition(self, job_id: str, from_status, to_status: str, owner: str = None, **updates) -> bool:
+        """
+        Atomically move one job from `from_status` (str, tuple or None = any)
+        to `to_status`, merging `updates` into the job.
+        With `owner`, the job's lease must still belong to that worker.
+        Returns False if the job is missing or no longer in `from_status`.
+        """
+        if isinstance(from_status, str):
+            from_status = (from_status,)
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if (
+                row is None
+                or (from_status is not None and row["status"] not in from_status)
+                or (owner is not None and row["lease_owner"] != owner)
+            ):
+                conn.execute("ROLLBACK")
+                return False
+
+            job = self._to_job(row)
+            job.update(updates)
+            if to_status is not None:
+                job["status"] = to_status
+
+            conn.execute(self.UPDATE_SQL, self._to_row(job)[1:] + (job_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if job["status"] == "pending":
+            notify_scheduler([job_id])
+        return True
+
+    def update_job(self, job_id: str, **updates) -> bool:
+        return self.transition(job_id, None, updates.pop("status", None), **updates)
+
+    # ---------- leases ----------
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> Optional[Dict]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (status = 'pending' OR "
+                "(status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)))",
+                (job_id, _now()),
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+
+            job = self._to_job(row)
+            job.update(
+                status="running",
+                lease_owner=owner,
+                lease_expires=_in(lease_seconds),
+                claimed_at=datetime.now().isoformat(),
+            )
+            conn.execute(self.UPDATE_SQL, self._to_row(job)[1:] + (job_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return job
+
+    def heartbeat(self, job_ids: Iterable[str], owner: str, lease_seconds: float) -> List[str]:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            held = []
+            for job_id in job_ids:
+                cur = conn.execute(
+                    "UPDATE jobs SET lease_expires = ? "
+                    "WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                    (_in(lease_seconds), job_id, owner),
+                )
+                if cur.rowcount:
+                    held.append(job_id)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [j for j in job_ids if j not in held]
+
+    def reclaim_expired(self) -> int:
+        rows = self.conn.execute(
+            "SELECT id FROM jobs WHERE status = 'running' "
+            "AND (lease_expires IS NULL OR lease_expires < ?)",
+            (_now(),),
+        ).fetchall()
+
+        reclaimed = 0
+        for row in rows:
+            # re-checked inside the transition, so a heartbeat that just landed wins
+            if self._reclaim_one(row["id"]):
+                reclaimed += 1
+
+        if reclaimed:
+            print(f"[job_store] ♻ Reclaimed {reclaimed} jobs with expired leases")
+        return reclaimed
+
+    def _reclaim_one(self, job_id: str) -> bool:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND status = 'running' "
+                "AND (lease_expires IS NULL OR lease_expires < ?)",
+                (job_id, _now()),
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return False
+
+            job = self._to_job(row)
+            job.update(
+                status="pending",
+                last_error=f"Lease expired (worker {job.get('lease_owner') or 'unknown'})",
+                lease_owner=None,
+                lease_expires=None,
+            )
+            conn.execute(self.UPDATE_SQL, self._to_row(job)[1:] + (job_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        notify_scheduler([job_id])
+        return True
+
+    # ---------- reads ----------
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def list_jobs(self, status=None, limit: int = None) -> List[Dict]:
+        sql = "SELECT * FROM jobs"
+        params: list = []
+
+        if status:
+            if isinstance(status, str):
+                status = (status,)
+            sql += f" WHERE status IN ({','.join('?' * len(status))})"
+            params.extend(status)
+
+        sql += " ORDER BY scheduled_time IS NULL, scheduled_time"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [self._to_job(r) for r in self.conn.execute(sql, params)]
+
+    def count_by_status(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {r["status"]: r["n"] for r in rows}
+
+    def due_jobs(self, now=None, limit: int = None) -> List[Dict]:
+        """Pending jobs whose time has come (plus pending jobs with no time at all)."""
+        now = normalize_time(now or datetime.now())
+        sql = (
+            "SELECT * FROM jobs WHERE status = 'pending' "
+            "AND (scheduled_time IS NULL OR scheduled_time <= ?) "
+            "ORDER BY scheduled_time"
+        )
+        params: list = [now]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [self._to_job(r) for r in self.conn.execute(sql, params)]
+
+    def unprepared_jobs(self, until=None, limit: int = None) -> List[Dict]:
+        until = normalize_time(until or datetime.now())
+        sql = (
+            "SELECT * FROM jobs WHERE status = 'pending' AND prepared_media IS NULL "
+            "AND scheduled_time IS NOT NULL AND scheduled_time <= ? "
+            "ORDER BY scheduled_time"
+        )
+        params: list = [until]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [self._to_job(r) for r in self.conn.execute(sql, params)]
+
+    def pending_times(self, job_ids: Iterable[str] = None) -> List[tuple]:
+        sql = "SELECT id, scheduled_time FROM jobs WHERE status = 'pending'"
+        params: list = []
+        if job_ids is not None:
+            params = list(job_ids)
+            if not params:
+                return []
+            sql += f" AND id IN ({','.join('?' * len(params))})"
+
+        return [(r[0], r[1]) for r in self.conn.execute(sql, params)]
+
+    def media_exists(self, media_path: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM jobs WHERE media_path = ? LIMIT 1", (media_path,)
+        ).fetchone()
+        return row is not None
+
+    def media_paths(self) -> set:
+        rows = self.conn.execute(
+            "SELECT DISTINCT media_path FROM jobs WHERE media_path IS NOT NULL"
+        )
+        return {r[0] for r in rows}
+
+
+# ---------------------------------------
+# Backend registry
+# ---------------------------------------
+BACKENDS = {
+    "sqlite": SQLiteJobStore,
+}
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def register_backend(name: str, cls):
+    BACKENDS[name] = cls
+
+
+def get_store() -> JobStore:
+    """
+    Process-wide job store.
+    On first use, a leftover scheduled_jobs.json is imported once.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                backend = BACKENDS[JOB_STORE_BACKEND]
+            except KeyError:
+                raise ValueError(f"Unknown JOB_STORE backend: {JOB_STORE_BACKEND}")
+
+            _store = backend()
+
+            if JOBS_FILE.exists():
+                _store.import_json(JOBS_FILE)
+
+        return _store
+
+
+# ---------------------------------------
+# CLI
+# ---------------------------------------
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = get_store()
+
+    if cmd == "import":
+        src = sys.argv[2] if len(sys.argv) > 2 else JOBS_FILE
+        store.import_json(src)
+    elif cmd == "stats":
+        print(json.dumps(store.count_by_status(), indent=2))
+    else:
+        print("Usage: python job_store.py [import <file> | stats]")
@@ -1,18 +1,21 @@
 import os
-from instagrapi import Client
+import sys
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 SESSION_FILE = "session_account3.json"
 IMAGE_FOLDER = "posts"
+SENDER = sys.argv[1] if len(sys.argv) > 1 else None   # optional: which of our accounts to use
 
 CAPTION = """🔥 Carousel post automated
 Swipe 👉
 #carousel #automation #instagrapi
 """
 
-# Login with session
-cl = Client()
-cl.load_settings(SESSION_FILE)
-print("✅ Session loaded")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
 # Collect images
 images = [
@@ -26,10 +29,11 @@ if len(images) < 2:
 
 print("📸 Images:", images)
 
-# Upload carousel
-cl.album_upload(
-    images,
-    caption=CAPTION
-)
+# Upload carousel (pooled session client)
+with account_slot(account["username"], "image"), pool.lease(account["session_file"]) as cl:
+    cl.album_upload(
+        images,
+        caption=CAPTION
+    )
 
 print("🎉 Carousel posted successfully!")
@@ -1,12 +1,8 @@
-from instagrapi import Client
-from utils.watermark_image import add_watermark_image
-import time
+from render_service import get_service
+from account_registry import registry
+from client_pool import pool
+from fanout import fan_out
 
-ACCOUNTS = [
-    "session_account3.json",
-    "session_account4.json",
-    "session_account5.json"
-]
 
 CAPTION = """
 🔥 Image Automation
@@ -17,20 +13,18 @@ Follow 👉 @mybrand
 """
 
 def post_image():
-    image = add_watermark_image(
-        "posts/img.jpg",
-        "posts/img_final.jpg",
-        "@mybrand"
-    )
-
-    for session in ACCOUNTS:
-        cl = Client()
-        cl.load_settings(session)
-        cl.login_by_sessionid(cl.sessionid)
-
-        time.sleep(2)
-        cl.photo_upload(image, CAPTION)
-        print(f"✅ Image posted with caption: {session}")
+    image = get_service().render("posts/img.jpg", "@mybrand")
+
+    def upload(account, _):
+        with pool.lease(account["session_file"]) as cl:
+            cl.photo_upload(image, CAPTION)
+
+    # every account in accounts.json, concurrently (per-account pacing still applies)
+    for r in fan_out(registry.all(listed_only=True), "image", upload):
+        if r["ok"]:
+            print(f"✅ Image posted with caption: @{r['username']} ({r['seconds']:.0f}s)")
+        else:
+            print(f"❌ Failed for @{r['username']}: {r['error']}")
 
 if __name__ == "__main__":
     post_image()
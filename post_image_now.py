@@ -1,11 +1,16 @@
-from instagrapi import Client
 import os
+import sys
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 SESSION = "session_account5.json"
 IMAGE_PATH = "posts"   # folder
+SENDER = sys.argv[1] if len(sys.argv) > 1 else None   # optional: which of our accounts to use
 
-cl = Client()
-cl.load_settings(SESSION)
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
 # latest image pick cheyyadam
 files = sorted(
@@ -15,9 +20,10 @@ files = sorted(
 
 latest_image = os.path.join(IMAGE_PATH, files[0])
 
-cl.photo_upload(
-    latest_image,
-    "🔥 Reposted image\n#repost #viral"
-)
+with account_slot(account["username"], "image"), pool.lease(account["session_file"]) as cl:
+    cl.photo_upload(
+        latest_image,
+        "🔥 Reposted image\n#repost #viral"
+    )
 
 print("✅ Image posted successfully")
@@ -1,22 +1,24 @@
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 from caption_utils import generate_caption
 
 def post_now(session, post_type, media, caption, hashtags):
-    cl = Client()
-    cl.load_settings(session)
-
     final_caption = generate_caption(caption, hashtags)
+    username = registry.by_session(session)["username"]
 
-    if post_type == "image":
-        cl.photo_upload(media, final_caption)
+    # account mutex + rate-limit token, then the pooled client for this session file
+    with account_slot(username, post_type), pool.lease(session) as cl:
+        if post_type == "image":
+            cl.photo_upload(media, final_caption)
 
-    elif post_type == "video":
-        cl.video_upload(media, final_caption)
+        elif post_type == "video":
+            cl.video_upload(media, final_caption)
 
-    elif post_type == "reel":
-        cl.clip_upload(media, final_caption)
+        elif post_type == "reel":
+            cl.clip_upload(media, final_caption)
 
-    elif post_type == "carousel":
-        cl.album_upload(media, final_caption)
+        elif post_type == "carousel":
+            cl.album_upload(media, final_caption)
 
     print("✅ Posted successfully")
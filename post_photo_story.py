@@ -1,13 +1,20 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 IMAGE_PATH = sys.argv[1]
 
-cl = Client()
-cl.load_settings("session_account3.json")
+SESSION_FILE = "session_account3.json"
+SENDER = sys.argv[2] if len(sys.argv) > 2 else None   # optional: which of our accounts to use
 
-print("✅ Session loaded")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-cl.photo_upload_to_story(IMAGE_PATH)
+with account_slot(account["username"], "story"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
+
+    cl.photo_upload_to_story(IMAGE_PATH)
 
 print("🖼️ Photo story uploaded successfully")
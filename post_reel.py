@@ -1,5 +1,7 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 # Command line nundi video path
 VIDEO_PATH = sys.argv[1]
@@ -7,18 +9,21 @@ VIDEO_PATH = sys.argv[1]
 # Caption optional
 CAPTION = sys.argv[2] if len(sys.argv) > 2 else "Reposted 🔁"
 
-# Client create
-cl = Client()
+SESSION_FILE = "session_account3.json"
+SENDER = sys.argv[3] if len(sys.argv) > 3 else None   # optional: which of our accounts to use
 
-# Session load (already login ayina account)
-cl.load_settings("session_account3.json")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-print("✅ Session loaded")
+# Session load (already login ayina account, pooled client)
+with account_slot(account["username"], "reel"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
 
-# 🔁 Reel upload
-cl.video_upload(
-    VIDEO_PATH,
-    caption=CAPTION
-)
+    # 🔁 Reel upload
+    cl.video_upload(
+        VIDEO_PATH,
+        caption=CAPTION
+    )
 
 print("🎬 Reel uploaded successfully")
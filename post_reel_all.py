@@ -1,12 +1,8 @@
-from instagrapi import Client
-from utils.watermark_video import add_watermark_video
-import time
+from render_service import get_service
+from account_registry import registry
+from client_pool import pool
+from fanout import fan_out
 
-ACCOUNTS = [
-    "session_account3.json",
-    "session_account4.json",
-    "session_account5.json"
-]
 CAPTION = """
 🔥 Reel Automation
 
@@ -16,20 +12,18 @@ Follow 👉 @mybrand
 """
 
 def post_reel():
-    video = add_watermark_video(
-        "posts/reel.mp4",
-        "posts/reel_final.mp4",
-        "@mybrand"
-    )
+    video = get_service().render("posts/reel.mp4", "@mybrand")
 
-    for session in ACCOUNTS:
-        cl = Client()
-        cl.load_settings(session)
-        cl.login_by_sessionid(cl.sessionid)
+    def upload(account, _):
+        with pool.lease(account["session_file"]) as cl:
+            cl.clip_upload(video, CAPTION)
 
-        time.sleep(3)
-        cl.clip_upload(video, CAPTION)
-        print(f"✅ Reel posted with caption: {session}")
+    # every account in accounts.json, concurrently (per-account pacing still applies)
+    for r in fan_out(registry.all(listed_only=True), "reel", upload):
+        if r["ok"]:
+            print(f"✅ Reel posted with caption: @{r['username']} ({r['seconds']:.0f}s)")
+        else:
+            print(f"❌ Failed for @{r['username']}: {r['error']}")
 
 if __name__ == "__main__":
     post_reel()
@@ -1,16 +1,22 @@
-from instagrapi import Client
+import sys
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 SESSION_FILE = "session_account3.json"
 REEL_PATH = "posts/reel1.mp4"
+SENDER = sys.argv[1] if len(sys.argv) > 1 else None   # optional: which of our accounts to use
 
 CAPTION = """🔥 Reposted Reel
 Follow for more
 #reels #viral #trending
 """
 
-cl = Client()
-cl.load_settings(SESSION_FILE)
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-cl.clip_upload(REEL_PATH, CAPTION)
+with account_slot(account["username"], "reel"), pool.lease(account["session_file"]) as cl:
+    cl.clip_upload(REEL_PATH, CAPTION)
 
 print("✅ Reel posted successfully")
@@ -1,18 +1,23 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 # Command line nundi video path
 VIDEO_PATH = sys.argv[1]
 
-cl = Client()
+SESSION_FILE = "session_account3.json"
+SENDER = sys.argv[2] if len(sys.argv) > 2 else None   # optional: which of our accounts to use
 
-# Session load (already login ayina account)
-cl.load_settings("session_account3.json")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-print("✅ Session loaded")
+# Session load (already login ayina account, pooled client)
+with account_slot(account["username"], "story"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
 
-# 📸 Story upload (video)
-cl.video_upload_to_story(VIDEO_PATH)
+    # 📸 Story upload (video)
+    cl.video_upload_to_story(VIDEO_PATH)
 
 print("📸 Story uploaded successfully")
-
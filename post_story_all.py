@@ -1,19 +1,18 @@
-from instagrapi import Client
-
-ACCOUNTS = [
-    "session_account3.json",
-    "session_account4.json",
-    "session_account5.json"
-]
+from account_registry import registry
+from client_pool import pool
+from fanout import fan_out
 
 def post_story():
-    for session in ACCOUNTS:
-        cl = Client()
-        cl.load_settings(session)
-        cl.login_by_sessionid(cl.sessionid)
+    def upload(account, _):
+        with pool.lease(account["session_file"]) as cl:
+            cl.photo_upload_to_story("posts/story.jpg")
 
-        cl.photo_upload_to_story("posts/story.jpg")
-        print(f"✅ Story posted: {session}")
+    # every account in accounts.json, concurrently (per-account pacing still applies)
+    for r in fan_out(registry.all(listed_only=True), "story", upload):
+        if r["ok"]:
+            print(f"✅ Story posted: @{r['username']} ({r['seconds']:.0f}s)")
+        else:
+            print(f"❌ Failed for @{r['username']}: {r['error']}")
 
 if __name__ == "__main__":
     post_story()
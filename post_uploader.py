@@ -1,21 +1,25 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 VIDEO_PATH = sys.argv[1]   # mp4 file path
 CAPTION = sys.argv[2] if len(sys.argv) > 2 else "Reposted 🔁"
 
-cl = Client()
+SESSION_FILE = "session_account5.json"
+SENDER = sys.argv[3] if len(sys.argv) > 3 else None   # optional: which of our accounts to use
 
-# Load session file
-cl.load_settings("session_account5.json")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-# ✅ No login call needed; session is already loaded
+# ✅ No login call needed; the pool loads the session file
+with account_slot(account["username"], "reel"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded successfully")
 
-print("✅ Session loaded successfully")
-
-cl.video_upload(
-    VIDEO_PATH,
-    caption=CAPTION
-)
+    cl.video_upload(
+        VIDEO_PATH,
+        caption=CAPTION
+    )
 
 print("🚀 Video posted successfully")
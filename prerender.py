@@ -0,0 +1,122 @@
+# ==============================================
+# PRE-RENDER STAGE (watermark + caption ahead of time)
+# ==============================================
+#
+# Pending jobs due within PRERENDER_LEAD_MINUTES are prepared ahead of
+# time, earliest deadline first: watermarked media + final caption are
+# stored on the job (prepared_media / prepared_caption), so at the due
+# minute scheduler_runner only has to upload. Up to RENDER_WORKERS jobs
+# are prepared at once (the renders themselves run in render_service's
+# process pool, which orders them by scheduled_time).
+#
+# Renders are named after the source + watermark, so another job can
+# render over them later; each job therefore gets its own hard link
+# under PREPARED_DIR/<job id>, removed once the job is done.
+
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from auto_scheduler import build_caption, prepare_media
+from job_store import get_store
+from render_service import RENDER_WORKERS
+from utils import media_provenance
+
+PRERENDER_LEAD_MINUTES = int(os.getenv("PRERENDER_LEAD_MINUTES", "30"))
+PRERENDER_IDLE_SLEEP = 30  # seconds between checks when nothing needs preparing
+PREPARED_DIR = Path(__file__).parent / ".prepared"
+
+
+def job_media_path(job, media) -> Path:
+    return PREPARED_DIR / f"{job['id']}{Path(media).suffix}"
+
+
+def discard_prepared(job):
+    """Remove a job's private prepared file (once it was posted or failed for good)."""
+    prepared = job.get("prepared_media")
+    if prepared and Path(prepared).parent == PREPARED_DIR:
+        media_provenance.remove(prepared)
+
+
+def prepare_job(job, store=None) -> bool:
+    """Render one job's media + caption and store the result on the job."""
+    store = store or get_store()
+    username = job["username"]
+
+    try:
+        media = prepare_media(
+            job["media_path"], username,
+            deadline=job.get("scheduled_time"), profile=job.get("encoding_profile"),
+        )
+        # private copy: a later render for another job can't change what this job posts
+        media = media_provenance.link(media, job_media_path(job, media))
+        caption = build_caption(username, job.get("post_type"))
+    except Exception as e:
+        # "" marks the job as attempted; the runner falls back to inline rendering
+        store.update_job(job["id"], prepared_media="", prepare_error=str(e))
+        print(f"[prerender] ❌ Failed for @{username}: {e}")
+        return False
+
+    # only attach it while the job is still pending: if a runner already
+    # claimed it (and posted inline), nobody will ever use or discard the file
+    if not store.transition(
+        job["id"], "pending", None,
+        prepared_media=media,
+        prepared_caption=caption,
+        prepared_at=datetime.now().isoformat(),
+    ):
+        media_provenance.remove(media)
+        print(f"[prerender] ⏭ {job['id'][:10]} is no longer pending, dropped its render")
+        return False
+
+    print(f"[prerender] ✔ Prepared {job['id'][:10]} for @{username}")
+    return True
+
+
+class Prerenderer:
+    def __init__(self, lead_minutes: int = PRERENDER_LEAD_MINUTES):
+        self.lead = timedelta(minutes=lead_minutes)
+        self.store = get_store()
+        self._wake = threading.Event()
+        self._active = set()            # job ids being prepared right now
+        self._active_lock = threading.Lock()
+        self.concurrency = max(1, RENDER_WORKERS)
+
+    def wake(self):
+        """Re-check immediately (e.g. after new jobs were enqueued)."""
+        self._wake.set()
+
+    def _prepare(self, job):
+        try:
+            prepare_job(job, self.store)
+        finally:
+            with self._active_lock:
+                self._active.discard(job["id"])
+            self.wake()
+
+    def run_forever(self):
+        while True:
+            try:
+                horizon = datetime.now() + self.lead
+                with self._active_lock:
+                    free = self.concurrency - len(self._active)
+                    active = set(self._active)
+
+                if free > 0:
+                    jobs = self.store.unprepared_jobs(until=horizon, limit=free + len(active))
+                    for job in [j for j in jobs if j["id"] not in active][:free]:
+                        with self._active_lock:
+                            self._active.add(job["id"])
+                        threading.Thread(
+                            target=self._prepare, args=(job,), name="prerender-job", daemon=True
+                        ).start()
+            except Exception as e:
+                print(f"[prerender] ❌ Loop error: {e}")
+
+            self._wake.wait(PRERENDER_IDLE_SLEEP)
+            self._wake.clear()
+
+    def start(self):
+        threading.Thread(target=self.run_forever, name="prerender", daemon=True).start()
+        return self
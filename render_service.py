@@ -0,0 +1,190 @@
+# ==============================================
+# RENDER SERVICE (process pool + deadline queue)
+# ==============================================
+#
+# Watermark renders used to run inline in whoever needed them (Streamlit
+# request, scheduler loop, batch script), one at a time per process.
+# RenderService runs them in a pool of RENDER_WORKERS processes:
+#   - submit() queues a render job and returns a concurrent.futures.Future
+#   - queued jobs are dispatched earliest deadline first (interactive
+#     renders use "now", prerendered jobs their scheduled_time)
+#   - identical jobs already queued / running share one future
+# Workers go through the normal render functions, so the render cache and
+# provenance sidecars apply as usual.
+#
+#   fut = get_service().submit("posts/x.mp4", ["@a", "@b"])
+#   fut.result()["@a"]["source"]  → posts/x_a_wm.mp4
+
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from scheduler_metrics import metrics
+# pool size lives next to the per-render core budget it is split against
+from utils.watermark_ffmpeg import RENDER_WORKERS
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+def _deadline(value) -> float:
+    """None → now, datetime / ISO string / epoch seconds → epoch seconds."""
+    if value is None:
+        return time.time()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def render_job(source, texts, formats=("source",), backend=None, profile=None):
+    """
+    Runs inside a worker process: one source, N watermark texts.
+    Returns {text: {format: output_path}} (images only have "source").
+    """
+    if str(source).lower().endswith(IMAGE_SUFFIXES):
+        from utils.watermark_image import add_watermark_to_image
+        # every text renders to its own <stem>_<tag>_wm.jpg
+        outputs = {text: {"source": add_watermark_to_image(source, text)} for text in texts}
+        if len({o["source"] for o in outputs.values()}) != len(outputs):
+            raise ValueError(f"Watermark texts {list(texts)} map to the same output file")
+        return outputs
+
+    from utils.watermark_batch import add_story_watermarks
+    return add_story_watermarks(source, texts, formats, backend, profile)
+
+
+class RenderService:
+    def __init__(self, workers: int = RENDER_WORKERS):
+        self.workers = workers
+        self._heap = []
+        self._seq = itertools.count()
+        self._inflight = {}                 # job key → Future
+        self._running = 0
+        self._cond = threading.Condition()
+        self._executor = None
+
+        if workers > 0:
+            threading.Thread(target=self._dispatch_loop, name="render-dispatch", daemon=True).start()
+
+    # ---------- public ----------
+    def submit(self, source, texts, formats=("source",), deadline=None, backend=None, profile=None) -> Future:
+        """
+        Queue a render; the future resolves to {text: {format: path}}.
+        profile: encoding profile name (utils/encoding_profiles).
+        """
+        texts = tuple(dict.fromkeys(texts))
+        formats = tuple(formats)
+        key = (os.path.abspath(source), texts, formats, backend, profile)
+
+        if self.workers <= 0:
+            # no pool: render right here (still returns a future)
+            fut = Future()
+            fut.set_running_or_notify_cancel()
+            try:
+                fut.set_result(render_job(source, texts, formats, backend, profile))
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+
+        with self._cond:
+            fut = self._inflight.get(key)
+            if fut is not None and not fut.done():
+                return fut
+
+            fut = Future()
+            self._inflight[key] = fut
+            heapq.heappush(self._heap, (_deadline(deadline), next(self._seq), key, fut))
+            metrics.set_gauge("scheduler_render_queue", len(self._heap))
+            self._cond.notify()
+
+        return fut
+
+    def render(self, source, text, deadline=None, backend=None, profile=None) -> str:
+        """Blocking single render: path of `source` watermarked with `text`."""
+        fut = self.submit(source, [text], deadline=deadline, backend=backend, profile=profile)
+        return fut.result()[text]["source"]
+
+    # ---------- dispatch ----------
+    def _pool(self):
+        if self._executor is None:
+            # spawn: the callers (Streamlit, scheduler) are multi-threaded, fork isn't safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _reset_pool(self, broken):
+        """Drop a broken pool (shutting down its management thread) so the next job starts a fresh one."""
+        with self._cond:
+            if broken is None or self._executor is not broken:
+                return                      # already replaced by another thread
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._running >= self.workers:
+                    self._cond.wait()
+                _, _, key, fut = heapq.heappop(self._heap)
+                metrics.set_gauge("scheduler_render_queue", len(self._heap))
+                if not fut.set_running_or_notify_cancel():
+                    self._inflight.pop(key, None)
+                    continue
+                self._running += 1
+
+            try:
+                pool = self._pool()
+                try:
+                    job = pool.submit(render_job, *key)
+                except BrokenProcessPool:
+                    # a worker died (OOM, crash): start a fresh pool for this and later jobs
+                    self._reset_pool(pool)
+                    pool = self._pool()
+                    job = pool.submit(render_job, *key)
+            except Exception as e:
+                self._finished(key, fut, error=e)
+                continue
+
+            job.add_done_callback(
+                lambda job, key=key, fut=fut, pool=pool: self._finished(key, fut, job, pool=pool)
+            )
+
+    def _finished(self, key, fut, job=None, error=None, pool=None):
+        if job is not None:
+            try:
+                fut.set_result(job.result())
+            except BrokenProcessPool as e:
+                self._reset_pool(pool)
+                fut.set_exception(e)
+            except Exception as e:
+                fut.set_exception(e)
+        else:
+            fut.set_exception(error)
+
+        with self._cond:
+            self._running -= 1
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            self._cond.notify()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> RenderService:
+    """Process-wide render service (pool started on first use)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RenderService()
+        return _service
@@ -1,14 +1,22 @@
 import os
 import shutil
-from instagrapi import Client
+import sys
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 SESSION_FILE = "session_account3.json"
 CAROUSEL_URL = "https://www.instagram.com/p/DRyowViDPM1/"
 CAPTION = "🔁 Reposted Carousel"
+SENDER = sys.argv[1] if len(sys.argv) > 1 else None   # optional: which of our accounts to use
 
 DOWNLOAD_DIR = "downloads"
 POST_DIR = "posts"
 
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
+
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
 # 🔥 CLEAN POSTS FOLDER
@@ -16,24 +24,23 @@ if os.path.exists(POST_DIR):
     shutil.rmtree(POST_DIR)
 os.makedirs(POST_DIR)
 
-cl = Client()
-cl.load_settings(SESSION_FILE)
-print("✅ Session loaded")
+with pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
 
-media_pk = cl.media_pk_from_url(CAROUSEL_URL)
-media = cl.media_info(media_pk)
+    media_pk = cl.media_pk_from_url(CAROUSEL_URL)
+    media = cl.media_info(media_pk)
 
-files = []
+    files = []
 
-if media.media_type != 8:
-    raise Exception("❌ URL is not a carousel")
+    if media.media_type != 8:
+        raise Exception("❌ URL is not a carousel")
 
-for item in media.resources:
-    if item.media_type == 1:
-        path = cl.photo_download(item.pk, folder=DOWNLOAD_DIR)
-    elif item.media_type == 2:
-        path = cl.video_download(item.pk, folder=DOWNLOAD_DIR)
-    files.append(path)
+    for item in media.resources:
+        if item.media_type == 1:
+            path = cl.photo_download(item.pk, folder=DOWNLOAD_DIR)
+        elif item.media_type == 2:
+            path = cl.video_download(item.pk, folder=DOWNLOAD_DIR)
+        files.append(path)
 
 # move ONLY carousel files
 post_files = []
@@ -42,6 +49,7 @@ for f in files:
     shutil.move(f, dest)
     post_files.append(dest)
 
-cl.album_upload(post_files, caption=CAPTION)
+with account_slot(account["username"], "image"), pool.lease(account["session_file"]) as cl:
+    cl.album_upload(post_files, caption=CAPTION)
 
 print("🎉 carousel posted successfully!")
@@ -0,0 +1,90 @@
+# ==============================================
+# RETRY POLICY (error classes + exponential backoff)
+# ==============================================
+#
+# Failed jobs are not left "failed": scheduler_runner asks next_retry()
+# when to try again and puts the job back into the due-heap with a new
+# scheduled_time. Nothing ever sleeps, so a retry never blocks other jobs.
+
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+
+# base/max delay in seconds; retries = default budget for that error class
+RETRY_POLICIES = {
+    "session":    {"base": 600, "max_delay": 6 * 3600,  "retries": 3},
+    "rate_limit": {"base": 900, "max_delay": 12 * 3600, "retries": 5},
+    "network":    {"base": 60,  "max_delay": 1800,      "retries": 5},
+    "bad_media":  {"base": 0,   "max_delay": 0,         "retries": 0},
+    "unknown":    {"base": 120, "max_delay": 3600,      "retries": MAX_RETRIES},
+}
+
+# instagrapi / requests exception class names → error class
+ERROR_CLASS_NAMES = {
+    "session": {
+        "LoginRequired", "ChallengeRequired", "BadPassword", "TwoFactorRequired",
+        "ReloginAttemptExceeded", "SelectContactPointRecoveryForm", "RecaptchaChallengeForm",
+    },
+    "rate_limit": {
+        "PleaseWaitFewMinutes", "RateLimitError", "FeedbackRequired",
+        "ClientThrottledError", "SentryBlock",
+    },
+    "network": {
+        "ClientConnectionError", "ClientRequestTimeout", "ConnectionError",
+        "Timeout", "ReadTimeout", "ConnectTimeout", "ProxyError",
+    },
+    "bad_media": {
+        "FileNotFoundError", "VideoNotUpload", "PhotoNotUpload", "ClipNotUpload",
+        "VideoTooLongException", "VideoConfigureError", "PhotoConfigureError",
+        "UnsupportedError",
+    },
+}
+
+# fallbacks for errors that only carry a message (e.g. auto_scheduler.get_client)
+ERROR_MESSAGE_HINTS = {
+    "session": ("session expired", "login_required", "challenge_required", "blocked"),
+    "rate_limit": ("please wait", "rate limit", "429", "feedback_required", "throttled"),
+    "network": ("timed out", "timeout", "connection reset", "connection aborted"),
+    "bad_media": ("unknown post_type", "no such file", "cannot identify image"),
+}
+
+
+def classify_error(exc: BaseException) -> str:
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    for error_class, class_names in ERROR_CLASS_NAMES.items():
+        if names & class_names:
+            return error_class
+
+    message = str(exc).lower()
+    for error_class, hints in ERROR_MESSAGE_HINTS.items():
+        if any(h in message for h in hints):
+            return error_class
+
+    return "unknown"
+
+
+def backoff_delay(error_class: str, attempt: int) -> float:
+    """Exponential backoff with jitter (between 50% and 100% of the capped delay)."""
+    policy = RETRY_POLICIES[error_class]
+    delay = min(policy["max_delay"], policy["base"] * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+def next_retry(job: Dict, exc: BaseException) -> Tuple[str, Optional[datetime]]:
+    """
+    Returns (error_class, retry_at). retry_at is None when the job's
+    retry budget for this class of error is used up.
+    """
+    error_class = classify_error(exc)
+    policy = RETRY_POLICIES[error_class]
+
+    # per-job budget overrides the class default; non-retryable classes stay at 0
+    budget = job.get("max_retries", policy["retries"]) if policy["retries"] else 0
+    attempt = job.get("retries", 0)
+    if attempt >= budget:
+        return error_class, None
+
+    return error_class, datetime.now() + timedelta(seconds=backoff_delay(error_class, attempt))
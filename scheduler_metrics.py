@@ -0,0 +1,239 @@
+# ==============================================
+# SCHEDULER METRICS (Prometheus text + JSON snapshot)
+# ==============================================
+#
+# scheduler_runner records:
+#   - queue lag per job (actual start - scheduled_time)
+#   - stage timings (get_client, watermark, caption, upload)
+#   - jobs per minute per account
+#   - pending / running / failed counts from the job store
+# and exports them on http://127.0.0.1:SCHEDULER_METRICS_PORT/metrics
+# plus logs/scheduler_metrics.json, which app.py reads for its dashboard.
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+BASE_DIR = Path(__file__).parent
+METRICS_FILE = BASE_DIR / "logs" / "scheduler_metrics.json"
+METRICS_PORT = int(os.getenv("SCHEDULER_METRICS_PORT", "9108"))
+SNAPSHOT_INTERVAL = 15      # seconds between JSON snapshots / store recounts
+RATE_WINDOW = 60            # seconds for jobs-per-minute
+
+HELP = {
+    "scheduler_queue_lag_seconds": "Job start time minus scheduled_time",
+    "scheduler_stage_seconds": "Time spent per posting stage",
+    "scheduler_jobs_total": "Finished jobs by account and result",
+    "scheduler_jobs_per_minute": "Finished jobs in the last minute by account",
+    "scheduler_queue_jobs": "Jobs in the store by status",
+    "scheduler_account_healthy": "1 if the account session passed its last check",
+    "scheduler_render_queue": "Render jobs waiting for a render worker",
+}
+
+
+def _labels(labels: Dict[str, str]) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[tuple, float] = {}
+        self.gauges: Dict[tuple, float] = {}
+        self.summaries: Dict[tuple, list] = {}   # key → [count, sum, max]
+        self._finished = deque()                 # (timestamp, username)
+
+    # ---------- recording ----------
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            s = self.summaries.setdefault(key, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += value
+            s[2] = max(s[2], value)
+
+    @contextmanager
+    def stage(self, stage: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("scheduler_stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def job_started(self, job: Dict):
+        due = job.get("scheduled_time")
+        if due:
+            lag = (datetime.now() - datetime.fromisoformat(due)).total_seconds()
+            self.observe("scheduler_queue_lag_seconds", max(0.0, lag), username=job.get("username"))
+
+    def job_finished(self, job: Dict, result: str):
+        username = job.get("username")
+        self.inc("scheduler_jobs_total", username=username, result=result)
+        with self._lock:
+            self._finished.append((time.time(), username))
+
+    def _refresh_rates(self):
+        cutoff = time.time() - RATE_WINDOW
+        with self._lock:
+            while self._finished and self._finished[0][0] < cutoff:
+                self._finished.popleft()
+            per_user: Dict[str, int] = {}
+            for _, username in self._finished:
+                per_user[username] = per_user.get(username, 0) + 1
+            for key in [k for k in self.gauges if k[0] == "scheduler_jobs_per_minute"]:
+                self.gauges[key] = 0
+        for username, n in per_user.items():
+            self.set_gauge("scheduler_jobs_per_minute", n * 60 / RATE_WINDOW, username=username)
+
+    # ---------- export ----------
+    def render_prometheus(self) -> str:
+        self._refresh_rates()
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{_fmt_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                header(name, "gauge")
+                lines.append(f"{name}{_fmt_labels(labels)} {value}")
+            summaries = sorted(self.summaries.items())
+            for (name, labels), (count, total, _) in summaries:
+                header(name, "summary")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+            for (name, labels), (_, _, peak) in summaries:
+                header(f"{name}_max", "gauge")
+                lines.append(f"{name}_max{_fmt_labels(labels)} {peak:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        self._refresh_rates()
+
+        def by_label(items, label):
+            out = {}
+            for (name, labels), value in items:
+                out.setdefault(name, {})[dict(labels).get(label, "")] = value
+            return out
+
+        with self._lock:
+            queue = by_label(
+                [i for i in self.gauges.items() if i[0][0] == "scheduler_queue_jobs"], "status"
+            ).get("scheduler_queue_jobs", {})
+            per_minute = by_label(
+                [i for i in self.gauges.items() if i[0][0] == "scheduler_jobs_per_minute"], "username"
+            ).get("scheduler_jobs_per_minute", {})
+            stages = {
+                dict(labels)["stage"]: {"count": c, "avg": t / c if c else 0, "max": m}
+                for (name, labels), (c, t, m) in self.summaries.items()
+                if name == "scheduler_stage_seconds"
+            }
+            lag = [v for (name, _), v in self.summaries.items() if name == "scheduler_queue_lag_seconds"]
+            lag_count = sum(v[0] for v in lag)
+            lag_sum = sum(v[1] for v in lag)
+
+        return {
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "queue": queue,
+            "jobs_per_minute": per_minute,
+            "stages": stages,
+            "queue_lag": {
+                "count": lag_count,
+                "avg": lag_sum / lag_count if lag_count else 0,
+                "max": max((v[2] for v in lag), default=0),
+            },
+        }
+
+
+# process-wide registry
+metrics = Metrics()
+
+
+# ---------------------------------------
+# Exporter (runs inside scheduler_runner)
+# ---------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _snapshot_loop(store):
+    METRICS_FILE.parent.mkdir(exist_ok=True)
+    seen = {"pending", "running", "done", "failed"}
+    while True:
+        try:
+            counts = store.count_by_status()
+            # statuses that drained since the last pass must read 0, not their old value
+            seen.update(counts)
+            for status in seen:
+                metrics.set_gauge("scheduler_queue_jobs", counts.get(status, 0), status=status)
+
+            tmp = METRICS_FILE.with_suffix(".tmp")
+            tmp.write_text(json.dumps(metrics.snapshot(), indent=2), encoding="utf8")
+            os.replace(tmp, METRICS_FILE)
+        except Exception as e:
+            print(f"[scheduler_metrics] ❌ Snapshot failed: {e}")
+        time.sleep(SNAPSHOT_INTERVAL)
+
+
+def start_exporter(store, port: int = METRICS_PORT):
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Metrics: http://127.0.0.1:{port}/metrics")
+    except OSError as e:
+        print(f"[scheduler_metrics] ⚠ Metrics port {port} unavailable ({e}) → JSON snapshot only")
+
+    threading.Thread(target=_snapshot_loop, args=(store,), name="metrics-snapshot", daemon=True).start()
+
+
+def read_snapshot(max_age: float = SNAPSHOT_INTERVAL * 4) -> Optional[Dict]:
+    """Latest snapshot written by a running scheduler, or None if missing / stale."""
+    try:
+        if time.time() - METRICS_FILE.stat().st_mtime > max_age:
+            return None
+        return json.loads(METRICS_FILE.read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        return None
@@ -1,14 +1,33 @@
+import os
 import time
-import json
+import socket
+import threading
 from datetime import datetime
-from pathlib import Path
 
+from account_limiter import get_limiter
+from account_registry import registry
+from account_workers import AccountWorkerPool
 from auto_scheduler import post_image, post_reel, post_story
+from job_store import get_store, normalize_time
+from prerender import Prerenderer, PRERENDER_LEAD_MINUTES, discard_prepared
+from retry_policy import next_retry
+from scheduler_metrics import metrics, start_exporter
+from scheduler_wakeup import DueHeap, WakeupListener, RESYNC
+from session_refresher import SessionRefresher
 
-JOBS_FILE = Path("scheduled_jobs.json")
+# Safety net for wakeups that never arrive (other hosts, dropped datagrams)
+RESYNC_INTERVAL = 300  # seconds
 
-print("⏰ Scheduler Runner started...")
-print("📂 Watching:", JOBS_FILE.resolve())
+# Lease-based claiming: several runners (processes or hosts) can share one store
+WORKER_ID = os.getenv("RUNNER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+HEARTBEAT_INTERVAL = LEASE_SECONDS / 3
+
+store = get_store()
+heap = DueHeap()
+
+held_jobs = set()
+held_lock = threading.Lock()
 
 
 def get_run_time(job):
@@ -24,82 +43,209 @@ def get_run_time(job):
     return datetime.fromisoformat(run_at)
 
 
-while True:
+def resync():
+    """Rebuild the due-heap from every pending job (id + time only)."""
+    heap.reset(store.pending_times())
+    print(f"🔄 Heap resynced: {len(heap)} pending jobs")
+
+
+def heartbeat_loop():
+    """Keep leases on in-flight jobs alive and reclaim jobs of dead workers."""
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        try:
+            with held_lock:
+                ids = list(held_jobs)
+
+            for job_id in store.heartbeat(ids, WORKER_ID, LEASE_SECONDS):
+                print(f"⚠ Lease lost for job {job_id[:10]} (claimed by another runner)")
+
+            store.reclaim_expired()
+        except Exception as e:
+            print("❌ Heartbeat error:", e)
+
+
+def lease_lost(job, status):
+    print(f"⚠ Lease lost for job {job['id'][:10]}: not marked {status} (another runner owns it now)")
+
+
+def fail_job(job, exc) -> bool:
+    """
+    Reschedule a failed job with backoff, or mark it failed when out of retries.
+    Returns False if our lease was lost meanwhile (the job was left alone).
+    """
+    error_class, retry_at = next_retry(job, exc)
+    retries = job.get("retries", 0) + 1
+    get_limiter().record_result(job["username"], job.get("post_type") or "post", exc)
+
+    if retry_at is None:
+        if not store.release(
+            job["id"], WORKER_ID, "failed",
+            last_error=str(exc), error_class=error_class, retries=retries
+        ):
+            lease_lost(job, "failed")
+            return False
+        discard_prepared(job)
+        print(f"❌ Failed for @{job['username']} ({error_class}, no retries left): {exc}")
+        return True
+
+    # back to pending: the store's wakeup puts it into the due-heap
+    due = normalize_time(retry_at)
+    if not store.release(
+        job["id"], WORKER_ID, "pending",
+        last_error=str(exc),
+        error_class=error_class,
+        retries=retries,
+        original_scheduled_time=job.get("original_scheduled_time") or job.get("scheduled_time"),
+        scheduled_time=due,
+    ):
+        lease_lost(job, "pending")
+        return False
+
+    print(f"🔁 Retry {retries} for @{job['username']} at {due} ({error_class}): {exc}")
+    return True
+
+
+def run_job(job):
+    """Runs on the job's account worker. Returns True if a post was attempted."""
+    run_at = get_run_time(job)
+
+    if run_at is None:
+        store.transition(
+            job["id"], "pending", "failed",
+            last_error="Missing scheduled_time / run_at"
+        )
+        return False
+
+    # claim with a lease (another runner may already own it)
+    job = store.claim(job["id"], WORKER_ID, LEASE_SECONDS)
+    if job is None:
+        return False
+
+    with held_lock:
+        held_jobs.add(job["id"])
+
+    print(f"🚀 Running job for @{job['username']} (worker {WORKER_ID})")
+    metrics.job_started(job)
+
+    # use the pre-rendered artifact if the prerender stage got to it
+    prepared = job.get("prepared_media")
+    if prepared and os.path.exists(prepared):
+        media, caption, watermark = prepared, job.get("prepared_caption"), False
+    else:
+        media, caption, watermark = job["media_path"], None, True
+
+    # bulk jobs only carry a username
+    session_file = job.get("session_file") or registry.session_file(job["username"])
+
     try:
-        if not JOBS_FILE.exists():
-            time.sleep(5)
-            continue
-
-        jobs = json.loads(JOBS_FILE.read_text())
-        now = datetime.now()
-        changed = False
-
-        for job in jobs:
-            # Only pending jobs
-            if job.get("status") != "pending":
-                continue
-
-            run_at = get_run_time(job)
-
-            if run_at is None:
-                job["status"] = "failed"
-                job["last_error"] = "Missing scheduled_time / run_at"
-                changed = True
-                continue
-
-            if now >= run_at:
-                print(f"🚀 Running job for @{job['username']}")
-
-                # mark as running first
-                job["status"] = "running"
-                JOBS_FILE.write_text(json.dumps(jobs, indent=2))
-
-                try:
-                    if job["post_type"] == "image":
-                        post_image(
-                            job["session_file"],
-                            job["media_path"],
-                            job["username"]
-                        )
-
-                    elif job["post_type"] == "reel":
-                        post_reel(
-                            job["session_file"],
-                            job["media_path"],
-                            job["username"]
-                        )
-                        time.sleep(60)  # anti-ban delay
-
-                    elif job["post_type"] == "story":
-                        post_story(
-                            job["session_file"],
-                            job["media_path"],
-                            job["username"]
-                        )
-
-                    else:
-                        raise Exception(f"Unknown post_type: {job['post_type']}")
-
-                    job["status"] = "done"
-                    print(f"✅ Done for @{job['username']}")
-                    changed = True
-
-                except Exception as e:
-                    job["status"] = "failed"
-                    job["last_error"] = str(e)
-                    print(f"❌ Failed for @{job['username']}: {e}")
-                    changed = True
-
-                # Save after each job
-                JOBS_FILE.write_text(json.dumps(jobs, indent=2))
-
-        if changed:
-            JOBS_FILE.write_text(json.dumps(jobs, indent=2))
+        if job["post_type"] == "image":
+            post_image(
+                session_file,
+                media,
+                job["username"],
+                caption=caption,
+                watermark=watermark
+            )
+
+        elif job["post_type"] == "reel":
+            post_reel(
+                session_file,
+                media,
+                job["username"],
+                caption=caption,
+                watermark=watermark,
+                profile=job.get("encoding_profile")
+            )
+
+        elif job["post_type"] == "story":
+            post_story(
+                session_file,
+                media,
+                job["username"],
+                watermark=watermark,
+                profile=job.get("encoding_profile")
+            )
+
+        else:
+            raise Exception(f"Unknown post_type: {job['post_type']}")
+
+        # lease reclaimed mid-upload: the job is another runner's now, don't count it as ours
+        if not store.release(job["id"], WORKER_ID, "done"):
+            lease_lost(job, "done")
+            return True
+
+        discard_prepared(job)
+        get_limiter().record_success(job["username"], job["post_type"])
+        metrics.job_finished(job, "done")
+        print(f"✅ Done for @{job['username']}")
 
     except Exception as e:
-        print("❌ Scheduler loop error:", e)
-
-    time.sleep(5)
+        if fail_job(job, e):
+            metrics.job_finished(job, "failed")
+
+    finally:
+        with held_lock:
+            held_jobs.discard(job["id"])
+
+    return True
+
+
+def run_loop():
+    print("⏰ Scheduler Runner started...")
+    print("📂 Job store:", store.db_path.resolve())
+    print("🪪 Worker id:", WORKER_ID)
+
+    listener = WakeupListener()
+    pool = AccountWorkerPool(run_job)
+    prerenderer = Prerenderer().start() if PRERENDER_LEAD_MINUTES > 0 else None
+    threading.Thread(target=heartbeat_loop, name="heartbeat", daemon=True).start()
+    SessionRefresher().start()
+    start_exporter(store)
+
+    store.reclaim_expired()
+    resync()
+    last_resync = time.monotonic()
+
+    while True:
+        try:
+            # sleep exactly until the earliest due job (or a wakeup)
+            wait = heap.seconds_until_next(datetime.now())
+            until_resync = RESYNC_INTERVAL - (time.monotonic() - last_resync)
+            wait = until_resync if wait is None else min(wait, until_resync)
+
+            woken = listener.wait(wait)
+            if woken and prerenderer:
+                prerenderer.wake()
+
+            if RESYNC in woken or time.monotonic() - last_resync >= RESYNC_INTERVAL:
+                resync()
+                last_resync = time.monotonic()
+            elif woken:
+                for job_id, due in store.pending_times(woken):
+                    heap.push(job_id, due)
+
+            now_iso = normalize_time(datetime.now())
+            for job_id in heap.pop_due(now_iso):
+                job = store.get_job(job_id)
+                if not job or job.get("status") != "pending":
+                    continue
+                if job.get("scheduled_time") and job["scheduled_time"] > now_iso:
+                    heap.push(job_id, job["scheduled_time"])  # rescheduled later
+                    continue
+                pool.submit(job)
+
+        except KeyboardInterrupt:
+            print("⏹ Scheduler stopped by user.")
+            break
+
+        except Exception as e:
+            print("❌ Scheduler loop error:", e)
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    run_loop()
 
 # # ======================================
 # # ADVANCED SCHEDULER (OPTIMIZED & STABLE)
@@ -0,0 +1,161 @@
+# ==============================================
+# SCHEDULER WAKEUPS (due-time heap + notify socket)
+# ==============================================
+#
+# scheduler_runner keeps every pending job in a min-heap keyed by its
+# normalized scheduled_time and sleeps until the earliest one.
+# Writers (job_store) send a tiny UDP datagram to localhost so the runner
+# wakes up as soon as a job is enqueued instead of polling.
+# Each local runner binds the first free port in WAKE_PORT..+WAKE_PORT_SLOTS
+# and notifications go to all of them.
+
+import os
+import time
+import heapq
+import socket
+import select
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+WAKE_HOST = "127.0.0.1"
+WAKE_PORT = int(os.getenv("SCHEDULER_WAKE_PORT", "47811"))
+WAKE_PORT_SLOTS = 8   # one port per runner process on this host
+
+RESYNC = "*"          # payload meaning "re-read every pending job"
+MAX_IDS_PER_PACKET = 20
+
+
+# ---------------------------------------
+# Notifier (used by writers)
+# ---------------------------------------
+def notify_scheduler(job_ids: Optional[Iterable[str]] = None):
+    """
+    Fire-and-forget wakeup for a local scheduler_runner.
+    Never raises: if nobody is listening the datagram is simply dropped.
+    """
+    ids = list(job_ids) if job_ids is not None else None
+    if ids is not None and not ids:
+        return
+
+    if ids is None or len(ids) > MAX_IDS_PER_PACKET:
+        payload = RESYNC
+    else:
+        payload = ",".join(ids)
+
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for port in range(WAKE_PORT, WAKE_PORT + WAKE_PORT_SLOTS):
+                try:
+                    sock.sendto(payload.encode("utf8"), (WAKE_HOST, port))
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+# ---------------------------------------
+# Listener (used by scheduler_runner)
+# ---------------------------------------
+class WakeupListener:
+    def __init__(self, port: int = WAKE_PORT):
+        self.sock = None
+        for p in range(port, port + WAKE_PORT_SLOTS):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.bind((WAKE_HOST, p))
+            except OSError:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            self.sock = sock
+            return
+
+        print("[scheduler_wakeup] ⚠ No free notify port → timed wakeups only")
+
+    def wait(self, timeout: Optional[float]) -> List[str]:
+        """
+        Block until a wakeup arrives or `timeout` seconds pass.
+        Returns the job ids received ([RESYNC] for a full resync).
+        """
+        if timeout is not None:
+            timeout = max(0.0, timeout)
+
+        if self.sock is None:
+            time.sleep(timeout or 0)
+            return []
+
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return []
+
+        ids: List[str] = []
+        while True:
+            try:
+                data = self.sock.recv(65535)
+            except (BlockingIOError, OSError):
+                break
+            ids.extend(p for p in data.decode("utf8", "ignore").split(",") if p)
+
+        return ids
+
+
+# ---------------------------------------
+# Due-time heap
+# ---------------------------------------
+class DueHeap:
+    """
+    Min-heap of (scheduled_time, job_id).
+    scheduled_time is the normalized ISO string from job_store, so ordering
+    is a plain string compare; only the head is ever parsed.
+    Stale entries (rescheduled / removed jobs) are dropped lazily.
+    """
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._due: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self._due)
+
+    def reset(self, entries: Iterable[tuple]):
+        self._due = {job_id: due or "" for job_id, due in entries}
+        self._heap = [(due, job_id) for job_id, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def push(self, job_id: str, due: Optional[str]):
+        due = due or ""
+        if self._due.get(job_id) == due:
+            return
+        self._due[job_id] = due
+        heapq.heappush(self._heap, (due, job_id))
+
+    def discard(self, job_id: str):
+        self._due.pop(job_id, None)
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[str]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now_iso: str) -> List[str]:
+        """Remove and return every job id whose time is <= now_iso."""
+        due_ids = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now_iso:
+                break
+            _, job_id = heapq.heappop(self._heap)
+            self._due.pop(job_id, None)
+            due_ids.append(job_id)
+        return due_ids
+
+    def seconds_until_next(self, now: datetime) -> Optional[float]:
+        head = self.next_due()
+        if head is None:
+            return None
+        if not head:
+            return 0.0
+        return (datetime.fromisoformat(head) - now).total_seconds()
@@ -1,20 +1,26 @@
 import sys
-from instagrapi import Client
+from account_limiter import account_slot
+from account_registry import registry
+from client_pool import pool
 
 USERNAME = sys.argv[1]   # receiver instagram username
 MESSAGE = sys.argv[2]    # message text
 
-cl = Client()
+SESSION_FILE = "session_account5.json"
+SENDER = sys.argv[3] if len(sys.argv) > 3 else None   # optional: which of our accounts to use
 
-# Session load
-cl.load_settings("session_account5.json")
+account = registry.get(SENDER) if SENDER else registry.by_session(SESSION_FILE)
+if account is None:
+    sys.exit(f"❌ Unknown account: {SENDER}")
 
-print("✅ Session loaded")
+# Session load (pooled client)
+with account_slot(account["username"], "dm"), pool.lease(account["session_file"]) as cl:
+    print("✅ Session loaded")
 
-# User ID get cheyyadam
-user_id = cl.user_id_from_username(USERNAME)
+    # User ID get cheyyadam
+    user_id = cl.user_id_from_username(USERNAME)
 
-# DM send
-cl.direct_send(MESSAGE, [user_id])
+    # DM send
+    cl.direct_send(MESSAGE, [user_id])
 
 print("💬 DM sent successfully")
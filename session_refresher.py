@@ -0,0 +1,153 @@
+# ==============================================
+# BACKGROUND SESSION REFRESHER
+# ==============================================
+#
+# Sessions used to be found dead only when a post was already waiting on
+# them. This thread walks every account in account_registry, validates
+# each session on a jittered schedule through client_pool, and re-logs
+# expired ones in advance (registry.password: accounts.json "password"
+# or env IG_PASSWORD_<USERNAME>). Work is serialized per account with
+# account_mutex; per-account health goes to logs/account_health.json.
+#
+# Runs inside scheduler_runner, or standalone:
+#   python session_refresher.py          # loop forever
+#   python session_refresher.py --once   # check every account once
+
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import account_manager
+from account_limiter import AccountBusy, account_mutex
+from account_registry import HEALTH_FILE, registry
+from client_pool import CLIENT_HEALTH_TTL, pool
+from retry_policy import classify_error
+from scheduler_metrics import metrics
+
+# Keep the interval (plus jitter) under CLIENT_HEALTH_TTL so the posting
+# path finds a freshly checked client and never pays the health check.
+SESSION_CHECK_INTERVAL = int(os.getenv("SESSION_CHECK_INTERVAL", str(int(CLIENT_HEALTH_TTL * 0.8))))
+SESSION_CHECK_JITTER = 0.2      # ± fraction of the interval
+BUSY_RETRY = 60                 # seconds, when the account is posting right now
+ERROR_RETRY = 300               # seconds, after a network / unknown error
+
+
+class SessionRefresher:
+    def __init__(self, interval: int = SESSION_CHECK_INTERVAL):
+        self.interval = interval
+        self.health: Dict[str, Dict] = registry.health()
+        self._lock = threading.Lock()
+
+    def _next_delay(self) -> float:
+        return self.interval * random.uniform(1 - SESSION_CHECK_JITTER, 1 + SESSION_CHECK_JITTER)
+
+    def _record(self, username: str, status: str, error: Optional[str] = None):
+        with self._lock:
+            entry = self.health.setdefault(username, {"relogins": 0})
+            entry.update(
+                status=status,
+                checked_at=datetime.now().isoformat(timespec="seconds"),
+                error=error,
+            )
+            if status == "relogged":
+                entry["relogins"] = entry.get("relogins", 0) + 1
+                entry["status"] = "ok"
+
+            HEALTH_FILE.parent.mkdir(exist_ok=True)
+            tmp = HEALTH_FILE.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.health, indent=2), encoding="utf8")
+            os.replace(tmp, HEALTH_FILE)
+
+        metrics.set_gauge("scheduler_account_healthy", 1 if entry["status"] == "ok" else 0, username=username)
+
+    def refresh(self, account: Dict) -> float:
+        """Validate (and if needed re-login) one account. Returns seconds until the next check."""
+        username = account["username"]
+        session_file = account["session_file"]
+
+        try:
+            with account_mutex(username, wait=False):
+                try:
+                    pool.check(session_file)
+                    self._record(username, "ok")
+                    return self._next_delay()
+                except Exception as e:
+                    cause = e.__cause__ or e
+                    if classify_error(cause) != "session":
+                        self._record(username, "error", str(cause))
+                        return ERROR_RETRY
+
+                password = registry.password(username)
+                if not password:
+                    self._record(username, "expired", "Session expired and no password configured")
+                    print(f"[session_refresher] ⚠ @{username}: session expired, re-login needs a password")
+                    return self._next_delay()
+
+                try:
+                    account_manager.relogin(username, session_file, password)
+                    pool.check(session_file)   # file changed → pool reloads it
+                except Exception as e:
+                    self._record(username, "expired", str(e))
+                    print(f"[session_refresher] ❌ @{username}: re-login failed: {e}")
+                    return self._next_delay()
+
+                self._record(username, "relogged")
+                print(f"[session_refresher] 🔑 @{username}: session renewed")
+                return self._next_delay()
+
+        except AccountBusy:
+            return BUSY_RETRY
+
+    def run_once(self):
+        for account in registry.all():
+            self.refresh(account)
+
+    def run_forever(self):
+        # spread the first round over one interval instead of a login storm
+        due = [(time.monotonic() + random.uniform(0, self.interval), a["username"]) for a in registry.all()]
+        heapq.heapify(due)
+
+        while True:
+            if not due:
+                time.sleep(self.interval)
+                due = [(time.monotonic(), a["username"]) for a in registry.all()]
+                heapq.heapify(due)
+                continue
+
+            at, username = heapq.heappop(due)
+            time.sleep(max(0.0, at - time.monotonic()))
+
+            # re-read so added / removed accounts and new passwords are picked up
+            accounts = {a["username"]: a for a in registry.all()}
+            for new in accounts.keys() - {u for _, u in due} - {username}:
+                heapq.heappush(due, (time.monotonic() + random.uniform(0, self.interval), new))
+
+            account = accounts.get(username)
+            if account is None:
+                continue
+            try:
+                delay = self.refresh(account)
+            except Exception as e:
+                print(f"[session_refresher] ❌ @{username}: {e}")
+                delay = ERROR_RETRY
+            heapq.heappush(due, (time.monotonic() + delay, username))
+
+    def start(self):
+        threading.Thread(target=self.run_forever, name="session-refresher", daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    refresher = SessionRefresher()
+    if "--once" in sys.argv:
+        refresher.run_once()
+        print(json.dumps(refresher.health, indent=2))
+    else:
+        print(f"🔑 Session refresher started (every ~{refresher.interval}s)")
+        refresher.run_forever()
@@ -0,0 +1,64 @@
+import os
+
+
+# ============================
+#   ENCODING PROFILES
+# ============================
+# Named x264 settings for every video render, trading render time
+# against upload size:
+#   fast      quick renders, smaller files (scheduled bulk posts)
+#   balanced  default
+#   archival  near-transparent quality, slow and large
+# All of them fit the video into Instagram's 1080×1920 (1920×1080 for
+# landscape) before the watermark is composited, and copy the audio when
+# the source already has AAC.
+
+PROFILES = {
+    "fast": {"preset": "veryfast", "crf": 26, "maxrate": "4M", "max_size": (1080, 1920)},
+    "balanced": {"preset": "medium", "crf": 23, "maxrate": "8M", "max_size": (1080, 1920)},
+    "archival": {"preset": "slow", "crf": 18, "maxrate": None, "max_size": (1080, 1920)},
+}
+
+DEFAULT_PROFILE = os.getenv("ENCODING_PROFILE", "balanced")
+
+
+def get_profile(name=None) -> dict:
+    """Profile dict (with its "name") for name, DEFAULT_PROFILE when None."""
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile: {name} (use {', '.join(PROFILES)})")
+    return {"name": name, **PROFILES[name]}
+
+
+def fit_size(vw, vh, max_size):
+    """
+    Largest even (w, h) with the source aspect that fits max_size
+    (rotated to the source orientation). None if no downscale is needed.
+    """
+    mw, mh = max_size
+    if (vw > vh) != (mw > mh):
+        mw, mh = mh, mw
+    scale = min(mw / vw, mh / vh)
+    if scale >= 1:
+        return None
+    w, h = int(vw * scale), int(vh * scale)
+    return (w - w % 2, h - h % 2)
+
+
+def rate_args(profile) -> list:
+    """ffmpeg quality / rate-cap args (CRF + optional VBV maxrate)."""
+    args = ["-crf", str(profile["crf"])]
+    if profile.get("maxrate"):
+        rate = int(profile["maxrate"].rstrip("M"))
+        args += ["-maxrate", profile["maxrate"], "-bufsize", f"{rate * 2}M"]
+    return args
+
+
+def video_args(profile) -> list:
+    """ffmpeg output args for the video stream."""
+    return ["-c:v", "libx264", "-preset", profile["preset"]] + rate_args(profile)
+
+
+def audio_codec(source_codec) -> str:
+    """ffmpeg -c:a value: copy AAC as-is, re-encode anything else."""
+    return "copy" if source_codec == "aac" else "aac"
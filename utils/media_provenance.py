@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+
+# ============================
+#   MEDIA PROVENANCE SIDECARS
+# ============================
+# Every rendered artifact gets a "<file>.provenance.json" next to it that
+# records what was already done to it:
+#
+#   {"source": "posts/x.mp4", "size": ..., "mtime_ns": ...,
+#    "transforms": [{"kind": "watermark", "text": "@a", "template": 1, "format": "source"}]}
+#
+# post_* look at it before watermarking, so media that already carries
+# @username (Post Now renders, prerendered jobs, cache hits) is uploaded
+# as-is instead of being re-encoded into "_wm_wm" files.
+# size + mtime must still match the file, otherwise the sidecar is ignored.
+
+SUFFIX = ".provenance.json"
+
+
+def sidecar_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + SUFFIX)
+
+
+def read(path):
+    """Sidecar dict for path, or None if missing / stale (file changed since)."""
+    try:
+        data = json.loads(sidecar_path(path).read_text(encoding="utf8"))
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("size") != st.st_size or data.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return data
+
+
+def transforms(path):
+    data = read(path)
+    return list(data["transforms"]) if data else []
+
+
+def source_of(path):
+    """The original file path was rendered from (path itself if untracked)."""
+    data = read(path)
+    return data["source"] if data else str(path)
+
+
+def record(path, transform, source):
+    """
+    Write path's sidecar: source's own transforms + this one.
+    Returns path so it can wrap a render call.
+    """
+    st = os.stat(path)
+    data = {
+        "source": source_of(source),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "transforms": transforms(source) + [transform],
+    }
+
+    side = sidecar_path(path)
+    tmp = side.with_name(side.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=1), encoding="utf8")
+    os.replace(tmp, side)
+    return path
+
+
+def link(path, dest):
+    """
+    Hard link (copy if linking fails) path to dest, carrying its sidecar along.
+    dest keeps the current content even if path is re-rendered later.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(path, dest)
+    except OSError:
+        shutil.copy2(path, dest)
+
+    data = read(path)
+    if data:
+        st = os.stat(dest)
+        data.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        sidecar_path(dest).write_text(json.dumps(data, indent=1), encoding="utf8")
+    return str(dest)
+
+
+def remove(path):
+    """Delete a file and its sidecar (missing ones are fine)."""
+    for p in (Path(path), sidecar_path(path)):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def find(path, kind, **params):
+    """First applied transform of this kind whose params all match, or None."""
+    for t in transforms(path):
+        if t.get("kind") == kind and all(t.get(k) == v for k, v in params.items()):
+            return t
+    return None
@@ -1,8 +1,9 @@
 import re
-import requests
-from instagrapi import Client
 from pathlib import Path
 
+from client_pool import pool
+from http_transport import download
+
 
 def _get_image_url(obj):
     # Version-safe image URL
@@ -27,17 +28,16 @@ def download_media_from_url(insta_url, session_file):
         post_type (str)
     """
 
-    cl = Client()
-    cl.load_settings(session_file)
-
     match = re.search(r"/(reel|p)/([A-Za-z0-9_-]+)/?", insta_url)
     if not match:
         raise ValueError("Invalid Instagram URL")
 
     shortcode = match.group(2)
 
-    media_pk = cl.media_pk_from_code(shortcode)
-    media = cl.media_info(media_pk)
+    # pooled client for this session (no fresh login / handshake per link)
+    with pool.lease(session_file) as cl:
+        media_pk = cl.media_pk_from_code(shortcode)
+        media = cl.media_info(media_pk)
 
     caption = media.caption_text or ""
 
@@ -49,24 +49,14 @@ def download_media_from_url(insta_url, session_file):
     # ---------------- REEL ----------------
     if media.media_type == 2:
         video_path = output_dir / f"{shortcode}.mp4"
-        r = requests.get(media.video_url, stream=True, timeout=60)
-        r.raise_for_status()
-        with open(video_path, "wb") as f:
-            for c in r.iter_content(1024 * 1024):
-                if c:
-                    f.write(c)
+        download(media.video_url, video_path)
 
         return [str(video_path)], caption, "reel"
 
     # ---------------- SINGLE IMAGE ----------------
     if media.media_type == 1:
         img_path = output_dir / f"{shortcode}.jpg"
-        r = requests.get(_get_image_url(media), stream=True, timeout=60)
-        r.raise_for_status()
-        with open(img_path, "wb") as f:
-            for c in r.iter_content(1024 * 1024):
-                if c:
-                    f.write(c)
+        download(_get_image_url(media), img_path)
 
         return [str(img_path)], caption, "image"
 
@@ -86,23 +76,13 @@ def download_media_from_url(insta_url, session_file):
             # IMAGE
             if item.media_type == 1:
                 img_path = output_dir / f"{shortcode}_{i}.jpg"
-                r = requests.get(_get_image_url(item), stream=True, timeout=60)
-                r.raise_for_status()
-                with open(img_path, "wb") as f:
-                    for c in r.iter_content(1024 * 1024):
-                        if c:
-                            f.write(c)
+                download(_get_image_url(item), img_path)
                 files.append(str(img_path))
 
             # VIDEO
             elif item.media_type == 2:
                 vid_path = output_dir / f"{shortcode}_{i}.mp4"
-                r = requests.get(item.video_url, stream=True, timeout=60)
-                r.raise_for_status()
-                with open(vid_path, "wb") as f:
-                    for c in r.iter_content(1024 * 1024):
-                        if c:
-                            f.write(c)
+                download(item.video_url, vid_path)
                 files.append(str(vid_path))
 
         if len(files) <= 1:
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from file_lock import file_mutex
+
+
+# ============================
+#   CONTENT-ADDRESSED RENDER CACHE
+# ============================
+# Rendered artifacts (watermarked videos / images) are stored under
+# RENDER_CACHE_DIR, keyed by sha256(source bytes) + watermark text +
+# template version (+ format). A retry, re-post or rescheduled job gets
+# the artifact back as a hard link (copy if linking fails) instead of a
+# re-render. index.json tracks size + last use; least recently used
+# entries are evicted once the cache is over RENDER_CACHE_MAX_MB.
+# Hits only note their last use in memory; those are written to index.json
+# with the next insert, or at most every TOUCH_FLUSH_SECONDS.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RENDER_CACHE_DIR = Path(os.getenv("RENDER_CACHE_DIR", str(BASE_DIR / ".render_cache")))
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "2048"))
+HASH_CHUNK = 1024 * 1024
+MAX_SOURCES = 10000     # remembered (path, size, mtime) → hash entries
+TOUCH_FLUSH_SECONDS = 60
+
+
+def _link_or_copy(src, dst):
+    dst = Path(dst)
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class RenderCache:
+    def __init__(self, root=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.index_path = self.root / "index.json"
+        self.lock_path = self.root / "index.lock"
+        self._touched = {}              # key → last_used not yet in index.json
+        self._touched_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    # ---------- index ----------
+    def _load(self):
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return {"entries": {}, "sources": {}}
+
+    def _apply_touches(self, index):
+        """Merge pending last_used updates into index (caller holds the file lock)."""
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.monotonic()
+        for key, last_used in touched.items():
+            entry = index["entries"].get(key)
+            if entry:
+                entry["last_used"] = max(entry["last_used"], last_used)
+
+    def _save(self, index):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(index, indent=1), encoding="utf8")
+        os.replace(tmp, self.index_path)
+
+    # ---------- keys ----------
+    def source_hash(self, path) -> str:
+        """sha256 of the file, remembered per (path, size, mtime) so big videos hash once."""
+        path = Path(path).resolve()
+        st = path.stat()
+        stamp = f"{path}|{st.st_size}|{st.st_mtime_ns}"
+
+        with file_mutex(self.lock_path):
+            known = self._load()["sources"].get(stamp)
+        if known:
+            return known
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        with file_mutex(self.lock_path):
+            index = self._load()
+            sources = {k: v for k, v in index["sources"].items() if not k.startswith(f"{path}|")}
+            sources[stamp] = digest
+            index["sources"] = dict(list(sources.items())[-MAX_SOURCES:])
+            self._save(index)
+        return digest
+
+    def key(self, kind, source, **params) -> str:
+        parts = [kind, self.source_hash(source)] + [f"{k}={params[k]}" for k in sorted(params)]
+        return hashlib.sha256("\n".join(parts).encode("utf8")).hexdigest()
+
+    # ---------- get / put ----------
+    def fetch(self, key, output_path) -> bool:
+        """Materialize a cached artifact at output_path. False on miss."""
+        with file_mutex(self.lock_path):
+            index = self._load()
+            entry = index["entries"].get(key)
+            if not entry:
+                return False
+            cached = self.root / entry["file"]
+            if not cached.exists():
+                del index["entries"][key]
+                self._apply_touches(index)
+                self._save(index)
+                return False
+
+        with self._touched_lock:
+            self._touched[key] = time.time()
+            flush = time.monotonic() - self._flushed_at > TOUCH_FLUSH_SECONDS
+
+        _link_or_copy(cached, output_path)
+        if flush:
+            with file_mutex(self.lock_path):
+                index = self._load()
+                self._apply_touches(index)
+                self._save(index)
+        return True
+
+    def store(self, key, rendered_path):
+        """Add a freshly rendered file, then evict least recently used entries."""
+        rendered_path = Path(rendered_path)
+        name = key + rendered_path.suffix
+        self.root.mkdir(parents=True, exist_ok=True)
+        _link_or_copy(rendered_path, self.root / name)
+
+        with file_mutex(self.lock_path):
+            index = self._load()
+            self._apply_touches(index)
+            now = time.time()
+            index["entries"][key] = {
+                "file": name,
+                "size": rendered_path.stat().st_size,
+                "created": now,
+                "last_used": now,
+            }
+
+            total = sum(e["size"] for e in index["entries"].values())
+            for old_key, entry in sorted(index["entries"].items(), key=lambda kv: kv[1]["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                if old_key == key:
+                    continue
+                try:
+                    (self.root / entry["file"]).unlink()
+                except FileNotFoundError:
+                    pass
+                total -= entry["size"]
+                del index["entries"][old_key]
+
+            self._save(index)
+
+
+cache = RenderCache()
+
+
+def cached_render(kind, source, output_path, render, **params):
+    """
+    Return output_path, rendering with render() only on a cache miss.
+    render() must write output_path and return it.
+    """
+    key = None
+    if RENDER_CACHE_MAX_MB > 0:
+        key = cache.key(kind, source, **params)
+        if cache.fetch(key, output_path):
+            print(f"[render_cache] ♻ Reused {kind} render → {output_path}")
+            return str(output_path)
+
+    # output_path may be a hard link (cache entry, a job's .prepared copy):
+    # unlink it so the new render can't overwrite those files in place
+    if os.path.lexists(output_path):
+        os.remove(output_path)
+
+    result = render()
+    if key is None:
+        return result
+    cache.store(key, result)
+    return result
@@ -0,0 +1,235 @@
+from moviepy.editor import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+import os
+import queue
+import subprocess
+import threading
+
+from utils import media_provenance
+from utils.encoding_profiles import audio_codec, fit_size, get_profile, rate_args
+from utils.render_cache import RENDER_CACHE_MAX_MB, cache
+from utils.watermark_compositor import FrameCompositor
+from utils.watermark_layers import LOGO_PATH, TEMPLATE_VERSION, build_layers, text_tag
+from utils.watermark_ffmpeg import (
+    ffmpeg_exe, probe, render_ffmpeg_many, render_ffmpeg_segmented, segment_jobs,
+)
+
+
+# ============================
+#   BATCH WATERMARK (decode once, encode many)
+# ============================
+# "Post Now" used to copy the source once per account and run a full
+# decode + encode per copy. add_story_watermarks() takes one source and
+# N watermark texts (× output formats), decodes every frame once and
+# feeds N encoders in parallel. The source is never copied.
+#
+#   outs = add_story_watermarks("posts/x.mp4", ["@a", "@b"], formats=("source", "feed"))
+#   outs["@a"]["feed"]  → posts/x_a_feed_wm.mp4
+
+# name → aspect (w, h); None keeps the source framing
+FORMATS = {
+    "source": None,
+    "story": (9, 16),
+    "feed": (4, 5),
+}
+
+
+def crop_box(vw, vh, aspect):
+    """Centered (x, y, w, h) crop with the given aspect, even sizes for yuv420p."""
+    if aspect is None:
+        return None
+    aw, ah = aspect
+    w, h = vw, vw * ah // aw
+    if h > vh:
+        w, h = vh * aw // ah, vh
+    w, h = w - w % 2, h - h % 2
+    if (w, h) == (vw, vh):
+        return None
+    return ((vw - w) // 2, (vh - h) // 2, w, h)
+
+
+def output_path_for(video_path, watermark_text, fmt):
+    stem, _ = os.path.splitext(video_path)
+    suffix = "" if fmt == "source" else f"_{fmt}"
+    return f"{stem}_{text_tag(watermark_text)}{suffix}_wm.mp4"
+
+
+def _targets(size, duration, watermark_texts, formats, video_path, logo_path):
+    vw, vh = size
+    targets = []
+    for text in watermark_texts:
+        for fmt in formats:
+            crop = crop_box(vw, vh, FORMATS[fmt])
+            w, h = (crop[2], crop[3]) if crop else (vw, vh)
+            layers = build_layers(w, h, duration, text, logo_path)
+            targets.append((text, fmt, output_path_for(video_path, text, fmt), layers, crop))
+    return targets
+
+
+# ============================
+#   MOVIEPY / NUMPY PATH
+# ============================
+def _encode_worker(frames, compositor, writer, crop, errors):
+    try:
+        while True:
+            item = frames.get()
+            if item is None:
+                return
+            frame, t = item
+            if crop:
+                x, y, w, h = crop
+                frame = frame[y:y + h, x:x + w]
+            writer.write_frame(compositor.composite(frame, t))
+    except Exception as e:
+        errors.append(e)
+        # keep draining so the decoder never blocks on this queue
+        while frames.get() is not None:
+            pass
+    finally:
+        writer.close()
+
+
+def _mux_audio(video_only, source, output_path, audio="copy"):
+    """Put the source's audio next to the rendered video (copied unless audio="aac")."""
+    cmd = [
+        ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+        "-i", video_only, "-i", source,
+        "-map", "0:v", "-map", "1:a?", "-c:v", "copy", "-c:a", audio,
+        "-movflags", "+faststart", output_path,
+    ]
+    subprocess.run(cmd, capture_output=True, check=True)
+    os.remove(video_only)
+
+
+def _render_moviepy_many(video_path, targets, profile=None, scale=None, audio="copy"):
+    profile = get_profile(profile)
+    # downscale while decoding, before anything is composited
+    video = VideoFileClip(
+        video_path, audio=False,
+        target_resolution=(scale[1], scale[0]) if scale else None,
+        resize_algorithm="lanczos",
+    )
+    fps = video.fps
+
+    workers, queues, errors = [], [], []
+    for _, _, output_path, layers, crop in targets:
+        w, h = (crop[2], crop[3]) if crop else tuple(video.size)
+        writer = FFMPEG_VideoWriter(
+            output_path + ".video.mp4", (w, h), fps,
+            codec="libx264", preset=profile["preset"], threads=2,
+            ffmpeg_params=rate_args(profile),
+        )
+        q = queue.Queue(maxsize=8)
+        th = threading.Thread(
+            target=_encode_worker,
+            args=(q, FrameCompositor(layers, (w, h), fps, video.duration), writer, crop, errors),
+            daemon=True,
+        )
+        th.start()
+        workers.append(th)
+        queues.append(q)
+
+    try:
+        # one decode; every encoder thread reads the same (read-only) frame
+        for i, frame in enumerate(video.iter_frames(fps=fps, dtype="uint8")):
+            for q in queues:
+                q.put((frame, i / fps))
+    finally:
+        for q in queues:
+            q.put(None)
+        for th in workers:
+            th.join()
+        video.close()
+
+    if errors:
+        raise errors[0]
+
+    for _, _, output_path, _, _ in targets:
+        _mux_audio(output_path + ".video.mp4", video_path, output_path, audio)
+
+
+# ============================
+#   PUBLIC API
+# ============================
+def add_story_watermarks(video_path, watermark_texts, formats=("source",), backend=None, profile=None):
+    """
+    Watermark one video for many texts (and formats) in a single decode.
+    profile: encoding profile name (utils/encoding_profiles, default ENCODING_PROFILE)
+    Returns {text: {format: output_path}}.
+    """
+    from utils.watermark_video import _resolve_backend
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(video_path)
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt}")
+
+    watermark_texts = list(dict.fromkeys(watermark_texts))
+    if not watermark_texts:
+        return {}
+
+    profile = get_profile(profile)
+    info = probe(video_path)
+    scale = fit_size(info["width"], info["height"], profile["max_size"])
+    audio = audio_codec(info["audio_codec"])
+    targets = _targets(
+        scale or (info["width"], info["height"]), info["duration"],
+        watermark_texts, formats, video_path, LOGO_PATH,
+    )
+
+    # outputs already in the render cache are linked, only the rest is rendered
+    keys, missing = {}, targets
+    if RENDER_CACHE_MAX_MB > 0:
+        missing = []
+        for target in targets:
+            text, fmt, output_path = target[:3]
+            key = keys[output_path] = cache.key(
+                "story_video", video_path,
+                text=text, template=TEMPLATE_VERSION, format=fmt, profile=profile["name"],
+            )
+            if cache.fetch(key, output_path):
+                print(f"[watermark_batch] ♻ Reused {text} ({fmt}) → {output_path}")
+            else:
+                missing.append(target)
+
+    # a previous output may be a hard link (cache entry, a job's .prepared copy):
+    # unlink it so the render writes a new file instead of changing those in place
+    for _, _, output_path, _, _ in missing:
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+
+    if missing:
+        backend = _resolve_backend(backend)
+        jobs = segment_jobs(info["duration"])
+        if backend == "ffmpeg" and len(missing) == 1 and jobs > 1:
+            # one long output: split it into parallel keyframe segments instead
+            _, _, output_path, layers, crop = missing[0]
+            render_ffmpeg_segmented(
+                video_path, output_path, layers, info["duration"], jobs,
+                profile["name"], scale, audio, crop,
+            )
+        elif backend == "ffmpeg":
+            render_ffmpeg_many(
+                video_path, [(out, layers, crop) for _, _, out, layers, crop in missing],
+                profile["name"], scale, audio,
+            )
+        else:
+            _render_moviepy_many(video_path, missing, profile["name"], scale, audio)
+
+        for _, _, output_path, _, _ in missing:
+            if output_path in keys:
+                cache.store(keys[output_path], output_path)
+
+    outputs = {}
+    for text, fmt, output_path, _, _ in targets:
+        media_provenance.record(
+            output_path,
+            {
+                "kind": "watermark", "text": text, "template": TEMPLATE_VERSION,
+                "format": fmt, "profile": profile["name"],
+            },
+            video_path,
+        )
+        outputs.setdefault(text, {})[fmt] = output_path
+    return outputs
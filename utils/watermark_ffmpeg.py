@@ -0,0 +1,323 @@
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from utils.encoding_profiles import get_profile, video_args
+
+
+# ============================
+#   FFMPEG WATERMARK BACKEND
+# ============================
+# Same three layers as the moviepy path (utils/watermark_layers), but
+# composited by one native ffmpeg filter graph:
+#   [video][moving wm]  overlay with a piecewise-linear x/y expression
+#   [..][static text]   overlay at a fixed position
+#   [..][logo]          overlay at a fixed position
+# Audio is passed through untouched. Several outputs (one per account /
+# format) can share a single decode via split, and one long video can be
+# cut at keyframes and encoded as parallel segments.
+
+# render_service runs RENDER_WORKERS renders side by side (x264 already uses
+# several threads per encode: ~4 cores per render); each render gets RENDER_CORES
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))
+RENDER_CORES = max(1, (os.cpu_count() or 1) // max(1, RENDER_WORKERS))
+
+# long videos: K parallel segment encodes (K = SEGMENT_JOBS, 1 disables)
+SEGMENT_JOBS = int(os.getenv("SEGMENT_JOBS", str(RENDER_CORES)))
+SEGMENT_MIN_SECONDS = float(os.getenv("SEGMENT_MIN_SECONDS", "30"))
+
+
+def ffmpeg_exe():
+    """ffmpeg on PATH, else the binary bundled with moviepy (imageio-ffmpeg)."""
+    exe = os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def probe(video_path):
+    """{"width", "height", "duration", "fps", "audio_codec"} of a video file."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-print_format", "json", "-show_streams", "-show_format", video_path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        data = json.loads(out)
+        video = next(s for s in data["streams"] if s["codec_type"] == "video")
+        audio = next((s for s in data["streams"] if s["codec_type"] == "audio"), None)
+        num, den = video.get("avg_frame_rate", "0/1").split("/")
+
+        # phone videos: ffmpeg auto-rotates, so report the displayed size
+        rotation = video.get("tags", {}).get("rotate") or next(
+            (d.get("rotation") for d in video.get("side_data_list", []) if "rotation" in d), 0
+        )
+        width, height = int(video["width"]), int(video["height"])
+        if abs(int(float(rotation))) % 180 == 90:
+            width, height = height, width
+
+        return {
+            "width": width,
+            "height": height,
+            "duration": float(data["format"].get("duration") or video.get("duration") or 0),
+            "fps": float(num) / float(den) if float(den) else 0.0,
+            "audio_codec": audio["codec_name"] if audio else None,
+        }
+
+    # no ffprobe (imageio-ffmpeg only ships ffmpeg) → parse "ffmpeg -i" output
+    return _probe_ffmpeg(video_path)
+
+
+def _probe_ffmpeg(video_path):
+    exe = ffmpeg_exe()
+    if not exe:
+        raise RuntimeError("ffmpeg not found (install ffmpeg or imageio-ffmpeg)")
+    # "ffmpeg -i" without an output exits non-zero but still prints the stream info
+    info = subprocess.run([exe, "-hide_banner", "-i", video_path], capture_output=True, text=True).stderr
+
+    video = re.search(r"Stream #\S+.*?: Video: .*?(\d{2,})x(\d{2,})", info)
+    if not video:
+        raise RuntimeError(f"No video stream in {video_path}: {info.strip()[-500:]}")
+    width, height = int(video.group(1)), int(video.group(2))
+
+    # phone videos: "rotate: 90" (old muxers) or "displaymatrix: rotation of -90.00 degrees"
+    rotation = re.search(r"rotate\s*:\s*(-?\d+)|displaymatrix: rotation of (-?[\d.]+)", info)
+    if rotation and abs(int(float(rotation.group(1) or rotation.group(2)))) % 180 == 90:
+        width, height = height, width
+
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", info)
+    fps = re.search(r"Stream #\S+.*?: Video: .*?([\d.]+) fps", info)
+    # codec name only; "unknown" if there is audio we can't name (→ re-encoded)
+    audio = re.search(r"Stream #\S+.*?: Audio: (\w+)|Stream #\S+.*?: Audio:", info)
+
+    return {
+        "width": width,
+        "height": height,
+        "duration": (int(duration.group(1)) * 3600 + int(duration.group(2)) * 60
+                     + float(duration.group(3))) if duration else 0.0,
+        "fps": float(fps.group(1)) if fps else 0.0,
+        "audio_codec": (audio.group(1) or "unknown") if audio else None,
+    }
+
+
+def _num(v):
+    return repr(float(v))
+
+
+def motion_expr(positions, axis, offset=0.0):
+    """
+    ffmpeg expression for position_at(positions, t + offset)[axis].
+    One gated term per segment (flat sum, so long videos don't nest deeply).
+    offset: where this input starts on the full video's timeline.
+    """
+    t = f"(t+{_num(offset)})" if offset else "t"
+    terms = []
+    for (t1, p1), (t2, p2) in zip(positions, positions[1:]):
+        if t2 <= offset:
+            continue
+        # same arithmetic as position_at, so both backends truncate identically
+        alpha = f"(({t}-{_num(t1)})/({_num(t2)}-{_num(t1)}))"
+        terms.append(
+            f"gte({t},{_num(t1)})*lt({t},{_num(t2)})*({p1[axis]}*(1-{alpha})+{p2[axis]}*{alpha})"
+        )
+    t_last, p_last = positions[-1]
+    terms.append(f"gte({t},{_num(t_last)})*{p_last[axis]}")
+    return "trunc(" + "+".join(terms) + ")"
+
+
+def filter_chain(layers, src="[0:v]", first_input=1, out="v", crop=None, offset=0.0):
+    """
+    Overlay chain src → [out] using inputs first_input (moving wm),
+    first_input+1 (text), first_input+2 (logo); optional crop (x, y, w, h) first.
+    """
+    i = first_input
+    x = motion_expr(layers["positions"], 0, offset)
+    y = motion_expr(layers["positions"], 1, offset)
+    tx, ty = layers["text_pos"]
+    lx, ly = layers["logo_pos"]
+
+    pre = ""
+    if crop:
+        cx, cy, cw, ch = crop
+        pre = f"{src}crop={cw}:{ch}:{cx}:{cy}[c_{out}];"
+        src = f"[c_{out}]"
+
+    return pre + (
+        f"{src}[{i}:v]overlay=x='{x}':y='{y}':eval=frame[a_{out}];"
+        f"[a_{out}][{i + 1}:v]overlay=x={tx}:y={ty}[b_{out}];"
+        f"[b_{out}][{i + 2}:v]overlay=x={lx}:y={ly},format=yuv420p[{out}]"
+    )
+
+
+def _scale_chain(scale, out="sc"):
+    """Downscale [0:v] to scale=(w, h) → [out], or ("", "[0:v]") without scaling."""
+    if not scale:
+        return "", "[0:v]"
+    w, h = scale
+    return f"[0:v]scale={w}:{h}:flags=lanczos[{out}];", f"[{out}]"
+
+
+def render_ffmpeg_many(video_path, targets, profile=None, scale=None, audio="copy"):
+    """
+    One decode, N encodes: targets = [(output_path, layers, crop or None), ...].
+    The decoded video is downscaled once (scale=(w, h), crops apply after),
+    split inside ffmpeg and every branch gets its own overlays + libx264
+    encoder with the profile's settings; audio is copied (or encoded with
+    audio="aac") into every output.
+    """
+    exe = ffmpeg_exe()
+    if not exe:
+        raise RuntimeError("ffmpeg not found (install ffmpeg or imageio-ffmpeg)")
+    encode = video_args(get_profile(profile))
+
+    with tempfile.TemporaryDirectory(prefix="wm_") as tmp:
+        inputs, chains, outputs = [], [], []
+
+        pre, source = _scale_chain(scale)
+        n = len(targets)
+        if n > 1:
+            chains.append(source + "split=" + str(n) + "".join(f"[s{k}]" for k in range(n)))
+
+        for k, (output_path, layers, crop) in enumerate(targets):
+            first_input = 1 + 3 * k
+            for name in ("wm", "text", "logo"):
+                png = os.path.join(tmp, f"{k}_{name}.png")
+                Image.fromarray(layers[name]).save(png)
+                inputs += ["-i", png]
+
+            src = f"[s{k}]" if n > 1 else source
+            chains.append(filter_chain(layers, src, first_input, f"v{k}", crop))
+            outputs += [
+                "-map", f"[v{k}]", "-map", "0:a?",
+                *encode,
+                "-c:a", audio,
+                "-movflags", "+faststart",
+                output_path,
+            ]
+
+        graph = os.path.join(tmp, "graph.txt")
+        with open(graph, "w", encoding="utf8") as f:
+            f.write(pre + ";".join(chains))
+
+        cmd = [
+            exe, "-hide_banner", "-loglevel", "error", "-y",
+            "-i", video_path, *inputs,
+            "-filter_complex_script", graph,
+            *outputs,
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg watermark failed: {result.stderr.strip()[-2000:]}")
+
+    return [t[0] for t in targets]
+
+
+def render_ffmpeg(video_path, output_path, layers, profile=None, scale=None, audio="copy"):
+    return render_ffmpeg_many(video_path, [(output_path, layers, None)], profile, scale, audio)[0]
+
+
+# ============================
+#   SEGMENT-PARALLEL RENDER (one long video)
+# ============================
+def segment_jobs(duration, jobs=None):
+    """Parallel segment encodes for a video of `duration` seconds (1 = one pass)."""
+    if jobs is None:
+        jobs = SEGMENT_JOBS if duration >= SEGMENT_MIN_SECONDS else 1
+    return max(1, jobs)
+
+
+def _split_at_keyframes(exe, video_path, tmp, k, duration):
+    """
+    Stream-copy the video track into ~k pieces, each starting on a keyframe.
+    Returns [(segment_path, start_seconds), ...].
+    """
+    cuts = ",".join(f"{duration * i / k:.3f}" for i in range(1, k))
+    listing = os.path.join(tmp, "segments.csv")
+    cmd = [
+        exe, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", video_path, "-map", "0:v:0", "-c", "copy",
+        "-f", "segment", "-segment_times", cuts, "-reset_timestamps", "1",
+        "-segment_list", listing, "-segment_list_type", "csv",
+        os.path.join(tmp, "src_%03d.mkv"),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg split failed: {result.stderr.strip()[-2000:]}")
+
+    with open(listing, newline="", encoding="utf8") as f:
+        return [(os.path.join(tmp, row[0]), float(row[1])) for row in csv.reader(f) if row]
+
+
+def render_ffmpeg_segmented(video_path, output_path, layers, duration, jobs=None,
+                            profile=None, scale=None, audio="copy", crop=None):
+    """
+    Watermark one video as `jobs` parallel encodes: split the video track at
+    keyframes, render every piece with its offset into the motion path,
+    concat the pieces without re-encoding and copy the source audio back in.
+    crop: optional (x, y, w, h) applied after scaling, as in render_ffmpeg_many.
+    """
+    exe = ffmpeg_exe()
+    if not exe:
+        raise RuntimeError("ffmpeg not found (install ffmpeg or imageio-ffmpeg)")
+
+    jobs = jobs or SEGMENT_JOBS
+    encode_args = video_args(get_profile(profile))
+
+    with tempfile.TemporaryDirectory(prefix="wmseg_") as tmp:
+        segments = _split_at_keyframes(exe, video_path, tmp, jobs, duration)
+
+        pngs = []
+        for name in ("wm", "text", "logo"):
+            png = os.path.join(tmp, f"{name}.png")
+            Image.fromarray(layers[name]).save(png)
+            pngs += ["-i", png]
+
+        # every piece gets an equal share of this render's cores (x264 threads)
+        threads = str(max(1, RENDER_CORES // len(segments)))
+
+        def encode(n, src, start):
+            graph = os.path.join(tmp, f"graph_{n:03d}.txt")
+            pre, source = _scale_chain(scale)
+            with open(graph, "w", encoding="utf8") as f:
+                f.write(pre + filter_chain(layers, source, crop=crop, offset=start))
+            out = os.path.join(tmp, f"out_{n:03d}.mp4")
+            cmd = [
+                exe, "-hide_banner", "-loglevel", "error", "-y",
+                "-i", src, *pngs,
+                "-filter_complex_script", graph,
+                "-map", "[v]", *encode_args, "-threads", threads,
+                out,
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg segment {n} failed: {result.stderr.strip()[-2000:]}")
+            return out
+
+        with ThreadPoolExecutor(max_workers=len(segments)) as ex:
+            outs = list(ex.map(lambda seg: encode(*seg), [(n, s, t) for n, (s, t) in enumerate(segments)]))
+
+        listing = os.path.join(tmp, "concat.txt")
+        with open(listing, "w", encoding="utf8") as f:
+            f.writelines(f"file '{out}'\n" for out in outs)
+
+        cmd = [
+            exe, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "concat", "-safe", "0", "-i", listing, "-i", video_path,
+            "-map", "0:v", "-map", "1:a?", "-c:v", "copy", "-c:a", audio,
+            "-movflags", "+faststart", output_path,
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg concat failed: {result.stderr.strip()[-2000:]}")
+
+    return output_path
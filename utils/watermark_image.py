@@ -36,27 +36,41 @@
 #     watermarked.convert("RGB").save(out_path, "JPEG")
 
 #     return out_path
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from pathlib import Path
 
+from utils import media_provenance
+from utils.render_cache import cached_render
+from utils.watermark_layers import load_font, text_tag
+
+# bump when the look below changes (part of the render cache key)
+IMAGE_TEMPLATE_VERSION = 1
+
 
 def add_watermark_to_image(image_path, text):
     """
     Safe image watermark (works with all Pillow versions)
+    → <name>_<text>_wm.jpg (one file per watermark text)
     """
     image_path = Path(image_path)
-    output_path = image_path.with_name(image_path.stem + "_wm.jpg")
+    output_path = image_path.with_name(f"{image_path.stem}_{text_tag(text)}_wm.jpg")
+
+    params = {"text": text, "template": IMAGE_TEMPLATE_VERSION}
+    output_path = cached_render(
+        "image", image_path, output_path,
+        lambda: _render(image_path, output_path, text), **params
+    )
+    return media_provenance.record(output_path, {"kind": "watermark", **params}, str(image_path))
+
 
+def _render(image_path, output_path, text):
     img = Image.open(image_path).convert("RGBA")
     width, height = img.size
 
     overlay = Image.new("RGBA", img.size, (255, 255, 255, 0))
     draw = ImageDraw.Draw(overlay)
 
-    try:
-        font = ImageFont.truetype("arial.ttf", int(width * 0.05))
-    except:
-        font = ImageFont.load_default()
+    font = load_font(int(width * 0.05))
 
     # ✅ NEW: textbbox instead of textsize
     bbox = draw.textbbox((0, 0), text, font=font)
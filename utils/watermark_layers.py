@@ -0,0 +1,244 @@
+from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+import hashlib
+import numpy as np
+import os
+import random
+import re
+
+from utils.render_cache import RENDER_CACHE_DIR
+
+
+# ============================
+#   WATERMARK LAYERS (shared by every render backend)
+# ============================
+# add_story_watermark draws three layers on top of the video:
+#   1. moving "@username" box, following a seeded keyframe path
+#   2. static faint "@username" text (lower-left center)
+#   3. assets/bottom_logo.png (bottom center)
+# Every backend (moviepy, ffmpeg ...) builds them here so they render the
+# same pixels at the same positions.
+#
+# The rasterized layers of one (text, video size, logo) are a compiled
+# "template": kept in an in-process LRU and in RENDER_CACHE_DIR/templates,
+# so repeat renders skip font fitting, text drawing and logo resizing.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_PATH = os.path.join(BASE_DIR, "..", "assets", "bottom_logo.png")
+
+MOVE_INTERVAL = 1.5   # seconds between motion keyframes
+MOTION_SEED = 42
+
+# Bump whenever the rendered look changes (sizes, opacity, motion, logo ...):
+# it is part of the render cache key, so old renders stop being reused.
+TEMPLATE_VERSION = 1
+
+TEMPLATE_DIR = RENDER_CACHE_DIR / "templates"
+TEMPLATE_LRU = int(os.getenv("TEMPLATE_LRU", "64"))
+TEMPLATE_DISK_MAX = 1000    # compiled templates kept on disk (oldest pruned)
+
+
+def text_tag(watermark_text):
+    """Filename-safe tag for a watermark text ("@my.handle" → "my.handle")."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "", watermark_text.lstrip("@")) or "wm"
+
+
+# ============================
+#   FONTS
+# ============================
+@lru_cache(maxsize=128)
+def load_font(size):
+    """arial.ttf at `size` (PIL's default font if missing), loaded once per size."""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except:
+        return ImageFont.load_default()
+
+
+# ============================
+#   AUTO SHRINK FONT
+# ============================
+def auto_shrink_font(draw, text, max_width, base_font_size):
+    """
+    Largest of base_font_size, base - 2, ... (> 10) whose text fits max_width
+    (the smallest one if none fits). Binary search: width grows with size.
+    """
+    sizes = list(range(base_font_size, 10, -2))
+    if not sizes:
+        return load_font(base_font_size)
+
+    def fits(size):
+        bbox = draw.textbbox((0, 0), text, font=load_font(size))
+        return bbox[2] - bbox[0] <= max_width
+
+    lo, hi = 0, len(sizes) - 1        # sizes is descending: find first that fits
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(sizes[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return load_font(sizes[lo])
+
+
+# =====================================================
+# 1️⃣ MOVING WATERMARK
+# =====================================================
+def moving_layer(vw, vh, watermark_text):
+    """RGBA array (H, W, 4) of the moving watermark box."""
+    W = int(vw * 0.45)
+    H = int(vh * 0.12)
+
+    wm_img = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(wm_img)
+
+    base_font_size = int(W * 0.18)
+    font = auto_shrink_font(draw, watermark_text, W * 0.95, base_font_size)
+
+    bbox = draw.textbbox((0, 0), watermark_text, font=font)
+    tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    tx = (W - tw) // 2
+    ty = (H - th) // 2
+
+    draw.text((tx, ty), watermark_text, font=font, fill=(255, 255, 255, 140))
+    return np.array(wm_img)
+
+
+def motion_keyframes(vw, vh, W, H, duration):
+    """[(t, (x, y)), ...] every MOVE_INTERVAL seconds, same seed → same path."""
+    rng = random.Random(MOTION_SEED)
+
+    positions = []
+    t = 0
+    while t < duration + MOVE_INTERVAL:
+        x = rng.randint(40, max(40, vw - W - 40))
+        y = rng.randint(40, max(40, vh - H - 40))
+        positions.append((t, (x, y)))
+        t += MOVE_INTERVAL
+    return positions
+
+
+def position_at(positions, t):
+    """Linear interpolation between keyframes (int pixels)."""
+    for i in range(len(positions) - 1):
+        t1, pos1 = positions[i]
+        t2, pos2 = positions[i + 1]
+        if t1 <= t <= t2:
+            alpha = (t - t1) / (t2 - t1)
+            x = int(pos1[0] * (1 - alpha) + pos2[0] * alpha)
+            y = int(pos1[1] * (1 - alpha) + pos2[1] * alpha)
+            return (x, y)
+    return positions[-1][1]
+
+
+# =====================================================
+# 2️⃣ STATIC TEXT WATERMARK
+# =====================================================
+def static_text_layer(vw, vh, watermark_text):
+    """
+    Faint text at (12%, 55%) of the frame.
+    Returns (RGBA array cropped to the drawn pixels, (x, y) of the crop).
+    """
+    text_layer = Image.new("RGBA", (vw, vh), (0, 0, 0, 0))
+    text_draw = ImageDraw.Draw(text_layer)
+
+    text_font = load_font(int(vw * 0.045))
+
+    tx2 = int(vw * 0.12)
+    ty2 = int(vh * 0.55)
+
+    text_draw.text(
+        (tx2, ty2),
+        watermark_text,
+        font=text_font,
+        fill=(255, 255, 255, 90)
+    )
+
+    # everything outside the text is fully transparent → crop it away
+    box = text_layer.getbbox() or (0, 0, 1, 1)
+    return np.array(text_layer.crop(box)), (box[0], box[1])
+
+
+# =====================================================
+# 3️⃣ STATIC LOGO PNG
+# =====================================================
+def logo_layer(vw, vh, logo_path=LOGO_PATH):
+    """Logo scaled to 45% of the width, bottom center. Returns (RGBA array, (x, y))."""
+    if not os.path.exists(logo_path):
+        raise FileNotFoundError(f"Logo not found: {logo_path}")
+
+    logo = Image.open(logo_path).convert("RGBA")
+    lw = int(vw * 0.45)
+    lh = max(1, round(logo.height * lw / logo.width))
+    logo = logo.resize((lw, lh), Image.LANCZOS)
+
+    return np.array(logo), ((vw - lw) // 2, vh - int(vh * 0.08))
+
+
+# =====================================================
+# COMPILED TEMPLATES
+# =====================================================
+ARRAYS = ("wm", "text", "logo")
+
+
+def _template_path(vw, vh, watermark_text, logo_stamp):
+    key = f"{TEMPLATE_VERSION}|{vw}x{vh}|{watermark_text}|{logo_stamp}"
+    return TEMPLATE_DIR / (hashlib.sha256(key.encode("utf8")).hexdigest() + ".npz")
+
+
+def _compile(vw, vh, watermark_text, logo_path):
+    wm = moving_layer(vw, vh, watermark_text)
+    text, text_pos = static_text_layer(vw, vh, watermark_text)
+    logo, logo_pos = logo_layer(vw, vh, logo_path)
+    return {"wm": wm, "text": text, "text_pos": text_pos, "logo": logo, "logo_pos": logo_pos}
+
+
+def _prune_templates():
+    files = sorted(TEMPLATE_DIR.glob("*.npz"), key=lambda p: p.stat().st_mtime)
+    for old in files[:-TEMPLATE_DISK_MAX]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=TEMPLATE_LRU)
+def _template(vw, vh, watermark_text, logo_path, logo_stamp):
+    path = _template_path(vw, vh, watermark_text, logo_stamp)
+    try:
+        with np.load(path) as data:
+            template = {name: data[name] for name in ARRAYS}
+            template["text_pos"] = tuple(int(v) for v in data["text_pos"])
+            template["logo_pos"] = tuple(int(v) for v in data["logo_pos"])
+    except (OSError, KeyError, ValueError):
+        template = _compile(vw, vh, watermark_text, logo_path)
+        try:
+            TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.stem + f".{os.getpid()}.tmp.npz")
+            np.savez_compressed(tmp, **template)
+            os.replace(tmp, path)
+            _prune_templates()
+        except OSError as e:
+            print(f"[watermark_layers] ⚠ Template not saved: {e}")
+
+    # shared between renders: nobody may draw into them
+    for name in ARRAYS:
+        template[name].flags.writeable = False
+    return template
+
+
+def compile_template(vw, vh, watermark_text, logo_path=LOGO_PATH):
+    """Ready-to-blend layers for (size, text, logo): LRU → disk → rasterize."""
+    if not os.path.exists(logo_path):
+        raise FileNotFoundError(f"Logo not found: {logo_path}")
+    st = os.stat(logo_path)
+    stamp = f"{os.path.abspath(logo_path)}|{st.st_size}|{st.st_mtime_ns}"
+    return _template(vw, vh, watermark_text, logo_path, stamp)
+
+
+def build_layers(vw, vh, duration, watermark_text, logo_path=LOGO_PATH):
+    """All three layers for one (video size, text) + the motion path for `duration`."""
+    layers = dict(compile_template(vw, vh, watermark_text, logo_path))
+    wm = layers["wm"]
+    layers["positions"] = motion_keyframes(vw, vh, wm.shape[1], wm.shape[0], duration)
+    return layers
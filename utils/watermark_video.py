@@ -1,154 +1,87 @@
-from PIL import Image, ImageDraw, ImageFont
-from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip
-import numpy as np
 import os
-import random
+
+from utils import media_provenance
+from utils.encoding_profiles import audio_codec, fit_size, get_profile
+from utils.render_cache import cached_render
+from utils.watermark_batch import _render_moviepy_many, output_path_for
+from utils.watermark_layers import LOGO_PATH, TEMPLATE_VERSION, build_layers
+from utils.watermark_ffmpeg import (
+    ffmpeg_exe, probe, render_ffmpeg, render_ffmpeg_segmented, segment_jobs,
+)
+
+# "ffmpeg"  → one native filter-graph pass, audio copied
+# "moviepy" → moviepy decode/encode + ROI-only NumPy compositing
+# "auto"    → ffmpeg when a binary is available
+WATERMARK_BACKEND = os.getenv("WATERMARK_BACKEND", "auto")
+
+
+def _resolve_backend(backend):
+    backend = backend or WATERMARK_BACKEND
+    if backend == "auto":
+        return "ffmpeg" if ffmpeg_exe() else "moviepy"
+    if backend not in ("ffmpeg", "moviepy"):
+        raise ValueError(f"Unknown watermark backend: {backend}")
+    return backend
 
 
 # ============================
-#   AUTO SHRINK FONT
+#   MOVIEPY BACKEND
 # ============================
-def auto_shrink_font(draw, text, max_width, base_font_size):
-    font_size = base_font_size
-    while font_size > 10:
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_w = bbox[2] - bbox[0]
-        if text_w <= max_width:
-            return font
-        font_size -= 2
-    return font
+def _render_moviepy(video_path, output_path, layers, profile=None, scale=None, audio="copy"):
+    # moving wm + merged text/logo, blended only where they are (FrameCompositor),
+    # then the source audio is muxed back in
+    _render_moviepy_many(video_path, [(None, "source", output_path, layers, None)], profile, scale, audio)
+    return output_path
 
 
 # ============================
 #   FINAL WATERMARK FUNCTION
 # ============================
-def add_story_watermark(video_path, watermark_text="@yourusername"):
+def add_story_watermark(video_path, watermark_text="@yourusername", backend=None, segments=None,
+                        profile=None):
+    """
+    Moving @username + static text + bottom logo → <name>_<tag>_wm.mp4
+    backend: "ffmpeg" / "moviepy" / "auto" (default: WATERMARK_BACKEND)
+    segments: parallel keyframe-segment encodes (ffmpeg backend); default
+    SEGMENT_JOBS for videos of SEGMENT_MIN_SECONDS or longer, else 1
+    profile: encoding profile name (utils/encoding_profiles, default ENCODING_PROFILE)
+    """
     if not os.path.exists(video_path):
         raise FileNotFoundError(video_path)
 
-    # ✅ DEFINE BASE_DIR FIRST
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    logo_path = os.path.join(BASE_DIR, "..", "assets", "bottom_logo.png")
-
-    print("LOGO PATH:", logo_path)
-    print("LOGO EXISTS:", os.path.exists(logo_path))
-
+    logo_path = LOGO_PATH
     if not os.path.exists(logo_path):
         raise FileNotFoundError(f"Logo not found: {logo_path}")
 
-    output_path = video_path.replace(".mp4", "_wm.mp4")
-
-    video = VideoFileClip(video_path)
-    vw, vh = video.size
-
-    # =====================================================
-    # 1️⃣ EXISTING MOVING WATERMARK (UNCHANGED)
-    # =====================================================
-    W = int(vw * 0.45)
-    H = int(vh * 0.12)
-
-    wm_img = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(wm_img)
-
-    base_font_size = int(W * 0.18)
-    font = auto_shrink_font(draw, watermark_text, W * 0.95, base_font_size)
-
-    bbox = draw.textbbox((0, 0), watermark_text, font=font)
-    tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    tx = (W - tw) // 2
-    ty = (H - th) // 2
-
-    draw.text((tx, ty), watermark_text, font=font, fill=(255, 255, 255, 140))
-    wm_array = np.array(wm_img)
-
-    move_interval = 1.5
-    random.seed(42)
-
-    positions = []
-    t = 0
-    while t < video.duration + move_interval:
-        x = random.randint(40, max(40, vw - W - 40))
-        y = random.randint(40, max(40, vh - H - 40))
-        positions.append((t, (x, y)))
-        t += move_interval
-
-    def random_move(t):
-        for i in range(len(positions) - 1):
-            t1, pos1 = positions[i]
-            t2, pos2 = positions[i + 1]
-            if t1 <= t <= t2:
-                alpha = (t - t1) / (t2 - t1)
-                x = int(pos1[0] * (1 - alpha) + pos2[0] * alpha)
-                y = int(pos1[1] * (1 - alpha) + pos2[1] * alpha)
-                return (x, y)
-        return positions[-1][1]
-
-    wm_clip = (
-        ImageClip(wm_array)
-        .set_duration(video.duration)
-        .set_pos(random_move)
-    )
-
-    # =====================================================
-    # 2️⃣ STATIC TEXT WATERMARK (PIL – lower-left center)
-    # =====================================================
-    text_layer = Image.new("RGBA", (vw, vh), (0, 0, 0, 0))
-    text_draw = ImageDraw.Draw(text_layer)
-
-    text_font_size = int(vw * 0.045)
-    try:
-        text_font = ImageFont.truetype("arial.ttf", text_font_size)
-    except:
-        text_font = ImageFont.load_default()
-
-    tx2 = int(vw * 0.12)
-    ty2 = int(vh * 0.55)
-
-    text_draw.text(
-        (tx2, ty2),
-        watermark_text,
-        font=text_font,
-        fill=(255, 255, 255, 90)
-    )
-
-    text_clip = ImageClip(np.array(text_layer)).set_duration(video.duration)
-
-    # =====================================================
-    # 3️⃣ STATIC LOGO PNG (BOTTOM CENTER)
-    # =====================================================
-    logo_clip = ImageClip(logo_path).resize(width=int(vw * 0.45))
-    logo_clip = (
-        logo_clip
-        .set_duration(video.duration)
-        .set_position(("center", vh - int(vh * 0.08)))
-        .set_opacity(1.0)
-    )
-
-    # =====================================================
-    # FINAL COMPOSITION
-    # =====================================================
-    final = CompositeVideoClip([
-        video,
-        wm_clip,
-        text_clip,
-        logo_clip
-    ])
-
-    final.write_videofile(
-        output_path,
-        codec="libx264",
-        audio_codec="aac",
-        preset="medium",
-        threads=4,
-        logger=None
-    )
-
-    return output_path
+    # same name as add_story_watermarks' "source" output (never the input itself)
+    output_path = output_path_for(video_path, watermark_text, "source")
+    profile = get_profile(profile)
+
+    def render():
+        info = probe(video_path)
+        # fit into Instagram's max size first, the layers are drawn at the output size
+        scale = fit_size(info["width"], info["height"], profile["max_size"])
+        vw, vh = scale or (info["width"], info["height"])
+        layers = build_layers(vw, vh, info["duration"], watermark_text, logo_path)
+        audio = audio_codec(info["audio_codec"])
+
+        if _resolve_backend(backend) == "ffmpeg":
+            jobs = segment_jobs(info["duration"], segments)
+            if jobs > 1:
+                return render_ffmpeg_segmented(
+                    video_path, output_path, layers, info["duration"], jobs,
+                    profile["name"], scale, audio,
+                )
+            return render_ffmpeg(video_path, output_path, layers, profile["name"], scale, audio)
+        return _render_moviepy(video_path, output_path, layers, profile["name"], scale, audio)
+
+    # both backends render the same look, so they share cache entries
+    params = {
+        "text": watermark_text, "template": TEMPLATE_VERSION,
+        "format": "source", "profile": profile["name"],
+    }
+    output_path = cached_render("story_video", video_path, output_path, render, **params)
+    return media_provenance.record(output_path, {"kind": "watermark", **params}, video_path)
 
 # ------------------------------------
 # from PIL import Image, ImageDraw, ImageFont
@@ -1,31 +1,14 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip
 import numpy as np
 import os
 import random
 
-# ============================
-#   FIXED — AUTO TEXT FIT
-# ============================
-def auto_shrink_font(draw, text, max_width, base_font_size):
-    """Shrink font so that watermark never gets cut."""
-    font_size = base_font_size
-
-    while font_size > 10:
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_w = bbox[2] - bbox[0]
-
-        if text_w <= max_width:
-            return font
-
-        font_size -= 2
-
-    return font
+from utils.encoding_profiles import audio_codec, fit_size, get_profile, rate_args
+from utils.watermark_batch import _mux_audio
+from utils.watermark_ffmpeg import probe
+# cached font loads + binary-searched fit, shared with the utils/ renderers
+from utils.watermark_layers import auto_shrink_font
 
 
 # ============================
@@ -58,8 +41,15 @@ def add_image_watermark(input_path, output_path, watermark_text="©descent_rahul
 # ============================
 #       MOVING VIDEO WM
 # ============================
-def add_video_watermark(input_path, output_path, watermark_text="©descent_rahul_"):
+def add_video_watermark(input_path, output_path, watermark_text="©descent_rahul_", profile=None):
+    profile = get_profile(profile)
     video = VideoFileClip(input_path)
+
+    # too big for Instagram → decode straight at the capped size
+    scale = fit_size(*video.size, profile["max_size"])
+    if scale:
+        video.close()
+        video = VideoFileClip(input_path, target_resolution=(scale[1], scale[0]), resize_algorithm="lanczos")
     vw, vh = video.size
 
     # Watermark box
@@ -114,5 +104,14 @@ def add_video_watermark(input_path, output_path, watermark_text="©descent_rahul
 
     wm_clip = ImageClip(wm_array).set_duration(video.duration).set_pos(random_move)
 
+    # video only; the source's audio is muxed back afterwards (AAC copied as-is)
     final = CompositeVideoClip([video, wm_clip])
-    final.write_videofile(output_path, codec="libx264", audio_codec="aac")
+    final.write_videofile(
+        output_path + ".video.mp4",
+        codec="libx264",
+        audio=False,
+        preset=profile["preset"],
+        ffmpeg_params=rate_args(profile),
+    )
+    video.close()
+    _mux_audio(output_path + ".video.mp4", input_path, output_path, audio_codec(probe(input_path)["audio_codec"]))
@@ -1,33 +1,152 @@
+import queue
+import subprocess
+import threading
+
 import cv2
 
-def add_video_watermark(input_video, output_video, username):
+from utils.encoding_profiles import audio_codec, fit_size, get_profile, video_args
+from utils.watermark_ffmpeg import ffmpeg_exe, probe
+
+
+# ============================
+#   PIPELINED CV2 WATERMARK
+# ============================
+# decode thread → draw thread → encode (this thread, ffmpeg stdin)
+# Frames travel in a fixed pool of PIPELINE_FRAMES preallocated buffers:
+# a buffer goes back to the decoder only after ffmpeg has consumed it,
+# so memory stays bounded and nothing is allocated per frame. ffmpeg
+# encodes H.264 and muxes the source's audio back in.
+
+PIPELINE_FRAMES = 8
+PIPELINE_JOIN_TIMEOUT = 10  # seconds to wait for the stage threads after a failure
+
+
+def add_video_watermark(input_video, output_video, username, profile=None):
+    profile = get_profile(profile)
+    exe = ffmpeg_exe()
+    if not exe:
+        raise RuntimeError("ffmpeg not found (install ffmpeg or imageio-ffmpeg)")
+
     cap = cv2.VideoCapture(input_video)
+    ok, first = cap.read()
+    if not ok:
+        cap.release()
+        raise RuntimeError(f"Cannot read video: {input_video}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    h, w = first.shape[:2]
+    scale = fit_size(w, h, profile["max_size"])
+    ow, oh = scale or (w, h)
+
+    text = f"@{username}"
+    org = (int(ow * 0.05), int(oh * 0.95))
+
+    # (decoded, output) buffer pairs; output is the decoded one when not scaling
+    free = queue.Queue()
+    for _ in range(PIPELINE_FRAMES):
+        src = first.copy()
+        dst = src if scale is None else cv2.resize(first, (ow, oh), interpolation=cv2.INTER_AREA)
+        free.put((src, dst))
 
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    decoded = queue.Queue(maxsize=PIPELINE_FRAMES)
+    drawn = queue.Queue(maxsize=PIPELINE_FRAMES)
+    stop = threading.Event()
+    errors = []
 
-    out = cv2.VideoWriter(output_video, fourcc, fps, (w, h))
+    def decode():
+        try:
+            # frame 0 was already read to size the buffers (every buffer starts as a copy)
+            decoded.put(free.get())
+            while not stop.is_set():
+                src, dst = free.get()
+                ok, frame = cap.read(src)      # decodes into src (same shape)
+                if not ok:
+                    break
+                decoded.put((frame, dst if scale is not None else frame))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            decoded.put(None)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def draw():
+        item = ()
+        try:
+            while True:
+                item = decoded.get()
+                if item is None:
+                    break
+                src, dst = item
+                if scale is not None:
+                    cv2.resize(src, (ow, oh), dst=dst, interpolation=cv2.INTER_AREA)
+                cv2.putText(dst, text, org, cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+                drawn.put(item)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            # keep emptying decoded (recycling its buffers) so decode can see stop and finish
+            while item is not None:
+                if item:
+                    free.put(item)
+                item = decoded.get()
+        finally:
+            drawn.put(None)
 
-        cv2.putText(
-            frame,
-            f"@{username}",
-            (int(w*0.05), int(h*0.95)),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (255,255,255),
-            2,
-            cv2.LINE_AA
-        )
+    cmd = [
+        exe, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{ow}x{oh}", "-r", str(fps), "-i", "-",
+        "-i", input_video,
+        "-map", "0:v", "-map", "1:a?",
+        *video_args(profile), "-pix_fmt", "yuv420p",
+        "-c:a", audio_codec(probe(input_video)["audio_codec"]),
+        "-movflags", "+faststart", "-shortest",
+        output_video,
+    ]
+    encoder = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
 
-        out.write(frame)
+    threads = [
+        threading.Thread(target=decode, name="wm-decode", daemon=True),
+        threading.Thread(target=draw, name="wm-draw", daemon=True),
+    ]
+    for th in threads:
+        th.start()
 
-    cap.release()
-    out.release()
+    # encode stage: hand each drawn frame to ffmpeg, then recycle its buffers
+    item = ()
+    try:
+        while True:
+            item = drawn.get()
+            if item is None:
+                break
+            encoder.stdin.write(memoryview(item[1]))
+            free.put(item)
+    except BrokenPipeError:
+        errors.append(RuntimeError("ffmpeg stopped reading frames"))
+    finally:
+        stop.set()
+        # on failure keep recycling buffers until decode + draw have wound down
+        try:
+            while item is not None:
+                item = drawn.get(timeout=PIPELINE_JOIN_TIMEOUT)
+                if item is not None:
+                    free.put(item)
+        except queue.Empty:
+            pass
+        for th in threads:
+            th.join(timeout=PIPELINE_JOIN_TIMEOUT)
+        stuck = [th.name for th in threads if th.is_alive()]
+        if stuck:
+            errors.append(RuntimeError(f"watermark pipeline threads did not stop: {stuck}"))
+        else:
+            cap.release()   # never while decode may still be reading from it
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = encoder.stderr.read().decode(errors="replace")
+        encoder.wait()
 
+    if encoder.returncode != 0:
+        raise RuntimeError(f"ffmpeg encode failed: {stderr.strip()[-2000:]}")
+    if errors:
+        raise errors[0]
+    return output_video